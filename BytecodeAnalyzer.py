@@ -38,12 +38,16 @@ class BytecodeAnalyzer:
         self.cfg = None
         self.basic_blocks = None
         self.var_storage_map = {}
+        self._instructions = None  # 反汇编结果缓存
 
     def _load_bytecode(self) -> str:
         with open(self.bytecode_path, 'r') as f:
             return f.read().strip()
 
     def disassemble(self) -> List[Dict[str, Any]]:
+        # 同一份字节码只反汇编一次（analyze_cfg 与调用方共用结果）
+        if self._instructions is not None:
+            return self._instructions
         code = self.bytecode
         if code.startswith('0x'):
             code = code[2:]
@@ -60,6 +64,7 @@ class BytecodeAnalyzer:
                 i += push_len
             instructions.append(instr)
             i += 1
+        self._instructions = instructions
         return instructions
 
     def analyze_cfg(self):
@@ -6,10 +6,11 @@ except ImportError:
     from BytecodeAnalyzer import BytecodeAnalyzer
 
 class TaintAnalyzer:
-    def __init__(self, bytecode_path: str, key_variables: List[str]):
+    def __init__(self, bytecode_path: str, key_variables: List[str], bytecode_analyzer=None):
         self.bytecode_path = bytecode_path
         self.key_variables = key_variables
-        self.bytecode_analyzer = BytecodeAnalyzer(bytecode_path, key_variables)
+        # 可传入已完成反汇编/CFG分析的 BytecodeAnalyzer，避免同一份字节码重复分析
+        self.bytecode_analyzer = bytecode_analyzer or BytecodeAnalyzer(bytecode_path, key_variables)
         self.bb = None
         self.cfg = None
         self.var_storage_map = None
@@ -35,7 +36,8 @@ class TaintAnalyzer:
         return False
 
     def analyze(self) -> List[Dict[str, Any]]:
-        self.bytecode_analyzer.analyze_cfg()
+        if self.bytecode_analyzer.basic_blocks is None:
+            self.bytecode_analyzer.analyze_cfg()
         self.bb = self.bytecode_analyzer.basic_blocks
         self.cfg = self.bytecode_analyzer.cfg
         self.bytecode_analyzer.match_key_vars_to_storage()
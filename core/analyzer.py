@@ -6,7 +6,7 @@
 
 import os
 import re
-from typing import List, Dict
+from typing import List, Dict, Optional
 from pathlib import Path
 from utils.colors import Colors
 from .compiler import SolcManager, ContractCompiler
@@ -20,11 +20,16 @@ class AllInOneAnalyzer:
     """一体化分析器"""
     
     def __init__(self, solc_version: str, key_variables: List[str], 
-                 contract_path: str, output_dir: str = "analysis_output"):
+                 contract_path: str, output_dir: str = "analysis_output",
+                 precompiled_json: Optional[Dict] = None):
         self.solc_version = solc_version
         self.key_variables = key_variables
         self.contract_path = contract_path
         self.output_dir = output_dir
+        # 🔧 新增：缓存的编译产物（ContractCompiler.export_artifacts 的结果），提供时跳过 solc 编译
+        self.precompiled_json = precompiled_json
+        # 🔧 新增：本次运行的编译产物，编译成功后设置，调用方可据此写入编译缓存
+        self.compiled_artifacts = None
         
         # 创建输出目录
         os.makedirs(output_dir, exist_ok=True)
@@ -77,8 +82,11 @@ class AllInOneAnalyzer:
             
             # 步骤2: 编译合约
             compiler = ContractCompiler(solc_manager.solc_path, self.output_dir)
-            if not compiler.compile(self.contract_path):
+            if self.precompiled_json is not None:
+                compiler.load_precompiled(self.precompiled_json)
+            elif not compiler.compile(self.contract_path):
                 return None
+            self.compiled_artifacts = compiler.export_artifacts()
             
             # 步骤3: 字节码分析
             # 🔧 改进：传递合约源文件和名称，用于获取存储布局
@@ -87,7 +95,8 @@ class AllInOneAnalyzer:
                 self.key_variables,
                 self.output_dir,
                 contract_source=self.contract_path,  # 🔧 新增
-                contract_name=self._extract_contract_name()  # 🔧 新增
+                contract_name=self._extract_contract_name(),  # 🔧 新增
+                solc_path=solc_manager.solc_path
             )
             if not bytecode_analyzer.analyze():
                 return None
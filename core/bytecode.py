@@ -10,18 +10,49 @@ import subprocess
 from typing import List, Dict, Optional
 from utils.colors import Colors
 from utils.constants import EVM_OPCODES
+from utils.json_io import write_json
+
+# 跳转指令（其后的指令是新基本块的起点）
+JUMP_OPS = frozenset({'JUMP', 'JUMPI'})
+
+# 会改变栈顶（使跳转目标变为动态计算值）的指令
+_DYNAMIC_TARGET_OPS = frozenset({'ADD', 'SUB', 'MUL', 'DIV', 'MLOAD', 'SLOAD', 'CALLDATALOAD'})
+
+# 终止指令（其所在基本块没有顺序流后继）
+_TERMINAL_OPS = frozenset({'RETURN', 'STOP', 'SELFDESTRUCT', 'REVERT', 'INVALID'})
+
+# 敏感操作码 → 严重程度与描述
+SENSITIVE_OPCODES = {
+    'SELFDESTRUCT': {'severity': 'critical', 'description': '合约自毁'},
+    'DELEGATECALL': {'severity': 'high', 'description': '委托调用（可改变合约状态）'},
+    'CALLCODE': {'severity': 'high', 'description': '代码调用（已弃用）'},
+    'CREATE': {'severity': 'medium', 'description': '创建新合约'},
+    'CREATE2': {'severity': 'medium', 'description': '确定性创建合约'},
+}
+
+
+def push_value(instr: Dict) -> Optional[int]:
+    """PUSH指令压入的整数值（优先使用反汇编时缓存的 push_val；数据为空时返回None）"""
+    if 'push_val' in instr:
+        return instr['push_val']
+    try:
+        return int(instr.get('push_data', '0'), 16)
+    except (TypeError, ValueError):
+        return None
 
 
 class BytecodeAnalyzer:
     """字节码分析器"""
     
     def __init__(self, bytecode: str, key_variables: List[str], output_dir: str, 
-                 contract_source: Optional[str] = None, contract_name: Optional[str] = None):
+                 contract_source: Optional[str] = None, contract_name: Optional[str] = None,
+                 solc_path: str = 'solc'):
         self.bytecode = bytecode
         self.key_variables = key_variables
         self.output_dir = output_dir
         self.contract_source = contract_source  # 🔧 新增：合约源文件路径（用于获取存储布局）
         self.contract_name = contract_name  # 🔧 新增：合约名称
+        self.solc_path = solc_path  # 🔧 新增：获取存储布局使用的 solc（与编译使用同一个版本）
         self.instructions = []
         self.basic_blocks = []
         self.cfg = {}
@@ -88,7 +119,10 @@ class BytecodeAnalyzer:
             
             if 0x60 <= opcode <= 0x7f:  # PUSH1-PUSH32
                 push_len = opcode - 0x5f
-                instr['push_data'] = code_bytes[i+1:i+1+push_len].hex()
+                push_data = code_bytes[i+1:i+1+push_len].hex()
+                instr['push_data'] = push_data
+                # 🔧 新增：反汇编时解析一次PUSH数据，避免后续槽位/跳转分析反复 int(hex, 16)
+                instr['push_val'] = int(push_data, 16) if push_data else None
                 i += push_len
             
             instructions.append(instr)
@@ -103,7 +137,7 @@ class BytecodeAnalyzer:
         block_starts = set([0]) | jumpdests
         
         for idx, instr in enumerate(self.instructions):
-            if instr['op'] in ('JUMP', 'JUMPI') and idx+1 < len(self.instructions):
+            if instr['op'] in JUMP_OPS and idx+1 < len(self.instructions):
                 block_starts.add(self.instructions[idx+1]['offset'])
         
         block_starts = sorted(block_starts)
@@ -157,7 +191,7 @@ class BytecodeAnalyzer:
                     cfg[b['start']].add(next_block)
             
             # 处理其他指令（顺序流）
-            elif last['op'] not in ('RETURN', 'STOP', 'SELFDESTRUCT', 'REVERT', 'INVALID'):
+            elif last['op'] not in _TERMINAL_OPS:
                 # 顺序流：继续到下一个基本块
                 next_block = None
                 for s in block_starts:
@@ -190,22 +224,21 @@ class BytecodeAnalyzer:
             
             # 找到PUSH指令
             if instr['op'].startswith('PUSH'):
-                try:
-                    # 提取PUSH的数据作为跳转目标
-                    target = int(instr.get('push_data', '0'), 16)
-                    
-                    # 验证：目标应该是合理的偏移量
-                    if 0 <= target < len(self.bytecode) // 2:
-                        # 进一步验证：目标位置应该是JUMPDEST
-                        target_instr = next((i for i in self.instructions if i['offset'] == target), None)
-                        if target_instr and target_instr['op'] == 'JUMPDEST':
-                            return target
-                except:
+                # 提取PUSH的数据作为跳转目标
+                target = push_value(instr)
+                if target is None:
                     continue
+                
+                # 验证：目标应该是合理的偏移量
+                if 0 <= target < len(self.bytecode) // 2:
+                    # 进一步验证：目标位置应该是JUMPDEST
+                    target_instr = next((i for i in self.instructions if i['offset'] == target), None)
+                    if target_instr and target_instr['op'] == 'JUMPDEST':
+                        return target
             
             # 如果遇到其他可能修改栈的指令，可能无法确定
             # 例如：DUP、SWAP不影响，但ADD、SUB等会修改
-            if instr['op'] in ('ADD', 'SUB', 'MUL', 'DIV', 'MLOAD', 'SLOAD', 'CALLDATALOAD'):
+            if instr['op'] in _DYNAMIC_TARGET_OPS:
                 # 动态计算的跳转目标
                 return None
         
@@ -246,7 +279,7 @@ class BytecodeAnalyzer:
             # 构建 solc 命令：--storage-layout
             # 注意：--storage-layout 在 solc 0.5.13+ 版本才支持
             cmd = [
-                'solc',
+                self.solc_path,
                 '--storage-layout',
                 '--combined-json', 'storage-layout',
                 self.contract_source
@@ -354,20 +387,12 @@ class BytecodeAnalyzer:
         
         返回包含敏感指令位置的列表
         """
-        sensitive_opcodes = {
-            'SELFDESTRUCT': {'severity': 'critical', 'description': '合约自毁'},
-            'DELEGATECALL': {'severity': 'high', 'description': '委托调用（可改变合约状态）'},
-            'CALLCODE': {'severity': 'high', 'description': '代码调用（已弃用）'},
-            'CREATE': {'severity': 'medium', 'description': '创建新合约'},
-            'CREATE2': {'severity': 'medium', 'description': '确定性创建合约'},
-        }
-        
         detected = []
         
         for instr in self.instructions:
             op = instr['op']
-            if op in sensitive_opcodes:
-                info = sensitive_opcodes[op]
+            if op in SENSITIVE_OPCODES:
+                info = SENSITIVE_OPCODES[op]
                 detected.append({
                     'offset': instr['offset'],
                     'opcode': op,
@@ -396,11 +421,13 @@ class BytecodeAnalyzer:
             'cfg': self.cfg,
             'variable_storage_map': self.var_storage_map,
             'sensitive_operations': self.sensitive_operations,  # 🔧 新增
-            'instructions_sample': self.instructions[:20]
+            # push_val 为内部缓存字段，不写入样例
+            'instructions_sample': [{k: v for k, v in instr.items() if k != 'push_val'}
+                                    for instr in self.instructions[:20]]
         }
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(result, f, indent=2, ensure_ascii=False)
+        # 🔧 改进：优先使用orjson序列化（带写缓冲）
+        write_json(output_file, result)
         
         print(f"  → 字节码分析结果: {output_file}")
 
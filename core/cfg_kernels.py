@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CFG可达性 / 路径枚举内核（可选 numba JIT 加速）
+
+把CFG压平成CSR数组（indptr / neighbors），用 @njit 编译的迭代DFS计算可达集，
+以及与 TaintAnalyzer 纯Python BFS 等价的污点路径枚举。
+只在安装了 numba（及其依赖 numpy）且基本块数量较多时启用，
+否则 TaintAnalyzer 使用原有的纯Python实现，结果一致。
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:  # numba / numpy 为可选依赖
+    np = None
+    njit = None
+
+# 基本块数量超过该阈值才使用JIT内核（块少时JIT编译预热开销大于收益）
+JIT_MIN_BLOCKS = 500
+
+
+def jit_available() -> bool:
+    """是否可以使用JIT内核"""
+    return njit is not None
+
+
+def _reach_kernel(indptr, neighbors, start_mask, allowed):
+    """
+    从 start_mask 标记的节点出发，只经过 allowed 节点的可达集（含起点）
+
+    Returns:
+        uint8数组，visited[i] == 1 表示节点i可达
+    """
+    n = indptr.shape[0] - 1
+    visited = np.zeros(n, np.uint8)
+    stack = np.empty(n, np.int64)  # 每个节点最多入栈一次
+    top = 0
+    for i in range(n):
+        if start_mask[i] and allowed[i]:
+            visited[i] = 1
+            stack[top] = i
+            top += 1
+    while top > 0:
+        top -= 1
+        node = stack[top]
+        for k in range(indptr[node], indptr[node + 1]):
+            nxt = neighbors[k]
+            if allowed[nxt] and not visited[nxt]:
+                visited[nxt] = 1
+                stack[top] = nxt
+                top += 1
+    return visited
+
+
+def _count_in_chain(entry_node, entry_cyclic, entry, node, limit):
+    """沿“最近的环上祖先”链统计 node 出现的次数，达到 limit 即返回"""
+    count = 0
+    while entry >= 0:
+        if entry_node[entry] == node:
+            count += 1
+            if count >= limit:
+                break
+        entry = entry_cyclic[entry]
+    return count
+
+
+def _paths_kernel(indptr, neighbors, sources, sink_mask, allowed, cyclic_mask,
+                  max_length, max_paths):
+    """
+    污点路径BFS（与 TaintAnalyzer.analyze 中的纯Python实现逐步一致）
+
+    队列项保存在平行数组中：节点、路径长度、父队列项、最近的环上祖先队列项（-1表示无）。
+    每条边最多入队一次（edge_visited 按CSR边下标标记），因此队列容量为 源数 + 边数。
+
+    Returns:
+        (entry_node, entry_parent, found, truncated)
+        found 为到达污点汇的队列项下标（按发现顺序），路径沿 entry_parent 还原
+    """
+    capacity = sources.shape[0] + neighbors.shape[0]
+    entry_node = np.empty(capacity, np.int64)
+    entry_length = np.empty(capacity, np.int64)
+    entry_parent = np.empty(capacity, np.int64)
+    entry_cyclic = np.empty(capacity, np.int64)
+    edge_visited = np.zeros(neighbors.shape[0], np.uint8)
+    found = np.empty(capacity, np.int64)
+    found_count = 0
+    truncated = False
+
+    tail = 0
+    for i in range(sources.shape[0]):
+        entry_node[tail] = sources[i]
+        entry_length[tail] = 1
+        entry_parent[tail] = -1
+        entry_cyclic[tail] = -1
+        tail += 1
+
+    head = 0
+    while head < tail:
+        entry = head
+        head += 1
+        node = entry_node[entry]
+        length = entry_length[entry]
+        if length > max_length:
+            continue
+
+        if sink_mask[node]:
+            found[found_count] = entry
+            found_count += 1
+            if max_paths >= 0 and found_count >= max_paths:
+                truncated = head < tail
+                break
+            continue
+
+        succ_cyclic = entry if cyclic_mask[node] else entry_cyclic[entry]
+        for k in range(indptr[node], indptr[node + 1]):
+            succ = neighbors[k]
+            if allowed[succ] and not edge_visited[k]:
+                if (not cyclic_mask[succ]
+                        or _count_in_chain(entry_node, entry_cyclic, entry, succ, 2) < 2):
+                    entry_node[tail] = succ
+                    entry_length[tail] = length + 1
+                    entry_parent[tail] = entry
+                    entry_cyclic[tail] = succ_cyclic
+                    tail += 1
+                    edge_visited[k] = 1
+
+    return entry_node[:tail], entry_parent[:tail], found[:found_count], truncated
+
+
+if njit is not None:
+    _reach_kernel = njit(cache=True, nogil=True)(_reach_kernel)
+    _count_in_chain = njit(cache=True, nogil=True)(_count_in_chain)
+    _paths_kernel = njit(cache=True, nogil=True)(_paths_kernel)
+
+
+class CSRGraph:
+    """CFG的CSR表示（正向 + 反向），节点为基本块起始偏移"""
+
+    def __init__(self, cfg: Dict[int, List[int]], nodes: Iterable[int] = ()):
+        node_ids = set(nodes)
+        for src, succs in cfg.items():
+            node_ids.add(src)
+            node_ids.update(succs)
+        self.nodes = sorted(node_ids)
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+
+        # 同一块的重复后继只保留第一次出现（与按 (块, 后继) 去重的边访问集合一致）
+        edges = [(self.index[src], self.index[succ])
+                 for src, succs in cfg.items() for succ in dict.fromkeys(succs)]
+        self.indptr, self.neighbors = self._to_csr(edges)
+        self.rev_indptr, self.rev_neighbors = self._to_csr([(b, a) for a, b in edges])
+        self._all_allowed = np.ones(len(self.nodes), np.uint8)
+
+    def _to_csr(self, edges):
+        n = len(self.nodes)
+        counts = np.zeros(n + 1, np.int64)
+        for src, _ in edges:
+            counts[src + 1] += 1
+        indptr = np.cumsum(counts)
+        neighbors = np.empty(len(edges), np.int64)
+        fill = indptr[:-1].copy()
+        for src, dst in edges:
+            neighbors[fill[src]] = dst
+            fill[src] += 1
+        return indptr, neighbors
+
+    def mask(self, nodes: Iterable[int]):
+        """节点集合 → uint8标记数组（图中不存在的节点忽略）"""
+        arr = np.zeros(len(self.nodes), np.uint8)
+        for node in nodes:
+            i = self.index.get(node)
+            if i is not None:
+                arr[i] = 1
+        return arr
+
+    def reachable(self, starts: Iterable[int], reverse: bool = False,
+                  allowed: Optional[Set[int]] = None) -> Set[int]:
+        """
+        从 starts 出发的可达节点集合（含起点）
+
+        Args:
+            starts: 起点
+            reverse: True 时沿反向边遍历
+            allowed: 只允许经过的节点（None表示不限制）；不在其中的起点也会被排除
+        """
+        indptr, neighbors = ((self.rev_indptr, self.rev_neighbors) if reverse
+                             else (self.indptr, self.neighbors))
+        allowed_mask = self._all_allowed if allowed is None else self.mask(allowed)
+        visited = _reach_kernel(indptr, neighbors, self.mask(starts), allowed_mask)
+        return {self.nodes[i] for i in np.flatnonzero(visited)}
+
+    def enumerate_paths(self, sources: List[int], sinks: Set[int], allowed: Set[int],
+                        cyclic: Set[int], max_length: int,
+                        max_paths: Optional[int] = None) -> Tuple[List[List[int]], bool]:
+        """
+        枚举污点源 → 污点汇的路径（按BFS发现顺序）
+
+        Args:
+            sources: 起点（按入队顺序）
+            sinks: 污点汇
+            allowed: 只允许经过的节点
+            cyclic: 处于环上的节点（允许在一条路径中出现最多2次）
+            max_length: 路径长度上限
+            max_paths: 路径数上限（None表示不限制）
+
+        Returns:
+            (路径列表, 是否因达到 max_paths 而提前结束)
+        """
+        index = self.index
+        source_ids = np.array([index[src] for src in sources], np.int64)
+        entry_node, entry_parent, found, truncated = _paths_kernel(
+            self.indptr, self.neighbors, source_ids, self.mask(sinks),
+            self.mask(allowed), self.mask(cyclic), max_length,
+            -1 if max_paths is None else max_paths)
+
+        nodes = self.nodes
+        paths = []
+        for entry in found:
+            path = []
+            while entry >= 0:
+                path.append(nodes[entry_node[entry]])
+                entry = entry_parent[entry]
+            path.reverse()
+            paths.append(path)
+        return paths, bool(truncated)
+
+
+def build_csr_graph(cfg: Dict[int, List[int]], nodes: Iterable[int],
+                    block_count: int) -> Optional[CSRGraph]:
+    """基本块足够多且numba可用时构建CSR图，否则返回None（使用纯Python实现）"""
+    if not jit_available() or block_count <= JIT_MIN_BLOCKS:
+        return None
+    return CSRGraph(cfg, nodes)
@@ -8,10 +8,33 @@ import os
 import re
 import subprocess
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional
 from utils.colors import Colors
 
 
+# 🔧 新增：本进程已解析出的 solc版本 → 该版本的可执行文件路径
+# 同一进程内再次分析同版本的合约（批量分析、多个测试）时跳过 solc-select 的检查；
+# 只记录版本专属的可执行文件（不记录 PATH 上的 'solc'，其版本可能被其他进程用 `solc-select use` 切换）
+_resolved_solc = {}
+
+
+def _solc_select_binary(version: str) -> Optional[str]:
+    """
+    🔧 新增：solc-select 已安装的指定版本 solc 可执行文件路径，未安装时返回 None
+    
+    直接调用该版本的可执行文件，不必用 `solc-select use` 切换全局版本
+    （多个进程同时切换会互相覆盖 ~/.solc-select/global-version）。
+    目录规则与 solc-select 相同：设置了 VIRTUAL_ENV 时位于虚拟环境目录下。
+    """
+    home = os.environ.get('VIRTUAL_ENV') or os.path.expanduser('~')
+    artifacts_dir = os.path.join(home, '.solc-select', 'artifacts')
+    for candidate in (os.path.join(artifacts_dir, f'solc-{version}', f'solc-{version}'),  # solc-select >= 1.0
+                      os.path.join(artifacts_dir, f'solc-{version}')):                    # 旧版本布局
+        if os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+    return None
+
+
 class SolcManager:
     """Solc版本管理器"""
     
@@ -24,6 +47,20 @@ class SolcManager:
         print(f"\n{Colors.HEADER}【步骤1】检查和切换Solc版本{Colors.ENDC}")
         print("-" * 80)
         
+        cached_path = _resolved_solc.get(self.version)
+        if cached_path is not None and os.path.isfile(cached_path):
+            self.solc_path = cached_path
+            print(f"✓ solc {self.version} 已就绪: {cached_path}")
+            return True
+        
+        if self._check_and_switch_version():
+            if self.solc_path != 'solc':
+                _resolved_solc[self.version] = self.solc_path
+            return True
+        return False
+    
+    def _check_and_switch_version(self) -> bool:
+        """检查 solc-select，切换版本或回退到系统solc"""
         # 检查是否安装了solc-select
         try:
             result = subprocess.run(['solc-select', 'versions'], 
@@ -53,15 +90,19 @@ class SolcManager:
                              check=True, capture_output=True)
                 print(f"✓ 安装完成")
             
-            # 切换版本
-            print(f"🔄 切换到 solc {self.version}...")
-            subprocess.run(['solc-select', 'use', self.version], 
-                         check=True, capture_output=True)
-            
-            self.solc_path = 'solc'
+            # 🔧 改进：直接使用该版本的可执行文件，不切换全局版本；
+            # 找不到（solc-select 目录布局不同）时才回退到 `solc-select use`
+            self.solc_path = _solc_select_binary(self.version)
+            if self.solc_path:
+                print(f"🔄 使用 solc {self.version}: {self.solc_path}")
+            else:
+                print(f"🔄 切换到 solc {self.version}...")
+                subprocess.run(['solc-select', 'use', self.version], 
+                             check=True, capture_output=True)
+                self.solc_path = 'solc'
             
             # 验证版本
-            result = subprocess.run(['solc', '--version'], 
+            result = subprocess.run([self.solc_path, '--version'], 
                                   capture_output=True, text=True)
             print(f"✓ 当前版本: {result.stdout.split('Version:')[1].split()[0]}")
             return True
@@ -95,12 +136,18 @@ class SolcManager:
             return False
 
 
+# 编译产物字段（export_artifacts / load_precompiled 使用）
+ARTIFACT_FIELDS = ('contract_name', 'bytecode', 'runtime_bytecode', 'asm', 'srcmap', 'srcmap_runtime',
+                   'combined_json')
+
+
 class ContractCompiler:
     """合约编译器"""
     
     def __init__(self, solc_path: str, output_dir: str):
         self.solc_path = solc_path
         self.output_dir = output_dir
+        self.contract_name = None  # 🔧 新增：选中的合约名称
         self.bytecode = None
         self.runtime_bytecode = None
         self.asm = None
@@ -164,6 +211,7 @@ class ContractCompiler:
                 return False
             
             print(f"  ✓ 选择合约: {contract_name}")
+            self.contract_name = contract_name
             self._load_artifacts(contract_name)
             
             # 🔧 新增：加载 combined.json（包含srcmap）
@@ -200,6 +248,41 @@ class ContractCompiler:
             traceback.print_exc()
             return False
     
+    def export_artifacts(self) -> Dict:
+        """🔧 新增：导出编译产物（可JSON序列化），用于编译缓存"""
+        return {attr: getattr(self, attr) for attr in ARTIFACT_FIELDS}
+    
+    def load_precompiled(self, artifacts: Dict) -> bool:
+        """🔧 新增：直接使用缓存的编译产物，跳过 solc 编译"""
+        print(f"\n{Colors.HEADER}【步骤2】编译合约（使用缓存的编译产物）{Colors.ENDC}")
+        print("-" * 80)
+        
+        for attr in ARTIFACT_FIELDS:
+            setattr(self, attr, artifacts.get(attr))
+        
+        # 与 solc -o 的输出一致：输出目录中写出所选合约的 .bin / .bin-runtime
+        # （generate_summary 据此区分“编译成功但分析失败”和“编译失败”）
+        self._write_bin_files()
+        
+        print(f"{Colors.GREEN}✓ 已加载编译缓存{Colors.ENDC}")
+        if self.runtime_bytecode:
+            print(f"  - Runtime bytecode: {len(self.runtime_bytecode)} 字符")
+        else:
+            print(f"  - Runtime bytecode: 未生成（可能是interface）")
+        
+        self._save_intermediate_files()
+        return True
+    
+    def _write_bin_files(self):
+        """🔧 新增：写出所选合约的 <合约名>.bin 和 <合约名>.bin-runtime（同 solc --bin --bin-runtime -o）"""
+        if not self.contract_name:
+            return
+        os.makedirs(self.output_dir, exist_ok=True)
+        base_path = os.path.join(self.output_dir, self.contract_name)
+        for ext, value in (('bin', self.bytecode), ('bin-runtime', self.runtime_bytecode)):
+            with open(f"{base_path}.{ext}", 'w') as f:
+                f.write(value or '')
+    
     def _supports_overwrite(self) -> bool:
         """🔧 新增：检查solc版本是否支持 --overwrite 选项"""
         try:
@@ -322,4 +405,3 @@ class ContractCompiler:
                 json.dump(self.combined_json, f, indent=2, ensure_ascii=False)
         
         print(f"  → 中间文件已保存到: {intermediate_dir}/")
-
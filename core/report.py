@@ -9,6 +9,7 @@ import os
 from datetime import datetime
 from typing import List, Dict
 from utils.colors import Colors
+from utils.json_io import read_json, write_json
 import re
 
 class ReportGenerator:
@@ -32,11 +33,10 @@ class ReportGenerator:
         taint_to_sensitive_flows = []
         source_mapping_path = os.path.join(self.output_dir, "intermediate", "source_mapping.json")
         try:
-            with open(source_mapping_path, 'r', encoding='utf-8') as f:
-                source_mapping_data = json.load(f)
-                if isinstance(source_mapping_data, dict):
-                    sensitive_functions = source_mapping_data.get('sensitive_functions', [])
-                    taint_to_sensitive_flows = source_mapping_data.get('taint_to_sensitive_flows', [])
+            source_mapping_data = read_json(source_mapping_path)
+            if isinstance(source_mapping_data, dict):
+                sensitive_functions = source_mapping_data.get('sensitive_functions', [])
+                taint_to_sensitive_flows = source_mapping_data.get('taint_to_sensitive_flows', [])
         except:
             pass
         
@@ -66,8 +66,7 @@ class ReportGenerator:
         
         # 保存最终报告
         final_report_path = os.path.join(self.output_dir, "final_report.json")
-        with open(final_report_path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2, ensure_ascii=False)
+        write_json(final_report_path, report)  # 🔧 改进：orjson序列化（未安装时回退标准库）
         
         print(f"\n{Colors.BLUE}💾 最终报告已保存:{Colors.ENDC}")
         print(f"   {final_report_path}")
@@ -630,11 +629,10 @@ class ReportGenerator:
         # 尝试从source_mapping.json读取
         try:
             source_mapping_path = os.path.join(self.output_dir, "intermediate", "source_mapping.json")
-            with open(source_mapping_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                # 如果有function_map，返回它
-                if 'function_map' in data:
-                    return data['function_map']
+            data = read_json(source_mapping_path)
+            # 如果有function_map，返回它
+            if 'function_map' in data:
+                return data['function_map']
         except:
             pass
         
@@ -4,11 +4,71 @@
 源码映射模块
 """
 
+import bisect
+import io
 import json
 import os
 import re
-from typing import List, Dict, Optional
+import sys
+from array import array
+from typing import List, Dict, NamedTuple, Optional
 from utils.colors import Colors
+from utils.json_io import write_json
+from .source_scanner import compute_line_metrics, scan_function_starts, scan_function_end
+
+
+# 标识符/单词切分（用于构建倒排索引）
+_WORD_RE = re.compile(r'\w+')
+
+# 访问控制修饰符关键词（子串匹配）
+ACCESS_CONTROL_MODIFIERS = (
+    # 常见的owner相关修饰符
+    'onlyOwner', 'onlyowner', 'ownerOnly', 'OwnerOnly',
+    # admin相关修饰符
+    'onlyAdmin', 'onlyadmin', 'adminOnly', 'AdminOnly',
+    # 其他通用访问控制修饰符
+    'onlyAuthorized', 'onlyMinter', 'onlyBurner', 'onlyGovernance',
+    'onlyController', 'onlyManager', 'onlyWhitelisted',
+    # is开头的检查
+    'isOwner', 'isAdmin', 'isAuthorized', 'isMinter',
+    # 状态控制修饰符
+    'whenNotPaused', 'whenPaused', 'notPaused',
+    # 安全相关修饰符
+    'nonReentrant', 'noReentrancy', 'reentrancyGuard',
+    # 其他常见模式
+    'senderIsOwner', 'onlyBy', 'restricted', 'protected',
+)
+
+
+def _keyword_regex(keywords) -> re.Pattern:
+    """把一组子串关键词编译成一个正则（一次扫描代替逐个 `in` 判断，语义不变）"""
+    return re.compile('|'.join(re.escape(k) for k in keywords))
+
+
+# 🔧 新增：预编译的关键词正则（模块级，所有实例共享）
+_ACCESS_CONTROL_MODIFIER_RE = _keyword_regex(ACCESS_CONTROL_MODIFIERS)
+# 函数内的任何条件语句（require/assert/revert/if/throw）
+_CONDITION_RE = _keyword_regex(('require(', 'require (', 'assert(', 'assert (',
+                                'revert(', 'revert (', 'if (', 'if(', 'throw'))
+# 写入行附近的条件语句（不含revert）
+_NEARBY_CONDITION_RE = _keyword_regex(('require(', 'require (', 'assert(', 'assert (',
+                                       'if (', 'if(', 'throw'))
+# 函数体内的require/assert及其中的访问主体
+_REQUIRE_RE = _keyword_regex(('require(', 'require ', 'assert('))
+_ACCESS_SUBJECT_RE = _keyword_regex(('msg.sender', 'tx.origin', 'owner', 'admin'))
+# 条件判断/返回语句（其中的变量使用视为读取）
+_READ_CONTEXT_RE = _keyword_regex(('if (', 'if(', 'require(', 'require (',
+                                   'assert(', 'assert (', 'return ', 'return('))
+
+
+class SrcLoc(NamedTuple):
+    """PC对应的源码位置（不可变、无实例__dict__；NamedTuple 兼容 Python 3.8+）"""
+    line: int                # 源码行号（从1开始）
+    column: int              # 列号（字节，从0开始）
+    code: str                # 该行代码（已strip）
+    function: Optional[str]  # 所属函数
+    offset: int              # srcmap字节偏移
+    length: int              # srcmap长度
 
 
 class SourceMapper:
@@ -23,6 +83,17 @@ class SourceMapper:
         self.source_lines = []
         self.function_map = {}
         self.srcmap_entries = []  # 🔧 新增：解析后的srcmap条目
+        self._pc_location_cache = {}  # 🔧 新增：PC → SrcLoc 缓存
+        self._pc_cache_instructions = None  # 缓存对应的指令列表
+        self._word_index = {}  # 🔧 新增：单词 → 行号列表（倒排索引）
+        self._function_def_line = {}  # 🔧 新增：函数名 → 定义行号
+        self._line_to_func = []  # 🔧 新增：行下标(0起) → 所属函数名
+        self._decl_lines_cache = {}  # 🔧 新增：函数名 → 包含 'function 函数名' 的源码行
+        self._acl_modifier_cache = {}  # 🔧 新增：函数名 → 是否有访问控制修饰符
+        self._public_acl_cache = {}  # 🔧 新增：函数名 → (has_control, reason)
+        self._offset_to_idx = {}  # 🔧 新增：指令偏移 → 指令下标
+        self._instr_offsets = []  # 🔧 新增：按指令顺序排列的偏移（升序）
+        self._offset_index_instructions = None  # 偏移索引对应的指令列表
         self._load_and_parse_source()
         
         # 🔧 新增：如果有srcmap，则解析它
@@ -31,114 +102,57 @@ class SourceMapper:
     
     def _load_and_parse_source(self):
         """加载并解析源码"""
-        with open(self.source_file, 'r', encoding='utf-8') as f:
-            self.source_lines = f.readlines()
+        # 🔧 改进：按字节读取一次，字节内容用于srcmap偏移换算，解码后得到源码行
+        with open(self.source_file, 'rb') as f:
+            self._source_bytes = f.read()
+        self.source_lines = io.StringIO(self._source_bytes.decode('utf-8'), newline=None).readlines()
+        
+        # 🔧 新增：预先计算每行去除首尾空白后的内容，以及是否为注释行（// * /* 开头）
+        self._src_stripped = [line.strip() for line in self.source_lines]
+        self._src_is_comment = bytearray(
+            1 if stripped.startswith(('//', '*', '/*')) else 0 for stripped in self._src_stripped
+        )
+        
+        # 🔧 新增：记录每个换行符的字节位置（有序），偏移→行号只需一次二分查找
+        self._newline_positions = array('l')
+        pos = self._source_bytes.find(b'\n')
+        while pos >= 0:
+            self._newline_positions.append(pos)
+            pos = self._source_bytes.find(b'\n', pos + 1)
+        
+        # 🔧 新增：构建倒排索引（单词 → 出现的行号，升序），一次构建、多次查询
+        for line_num, line in enumerate(self.source_lines, 1):
+            for word in set(_WORD_RE.findall(line)):
+                self._word_index.setdefault(word, []).append(line_num)
         
         # 提取合约名称（用于识别构造函数）
         self.contract_names = self._extract_contract_name()  # 改为复数，返回列表
         
         # 两阶段解析：先找所有函数/modifier定义，再分配行号
-        function_starts = []  # [(line_num, func_name, is_constructor, is_modifier), ...]
-        
         # 阶段1：找到所有函数/modifier定义（排除注释）
-        for line_num, line in enumerate(self.source_lines, 1):
-            # 移除注释后再匹配
-            code_part = line.split('//')[0]  # 移除单行注释
-            
-            # 🔧 新增：检查是否是 modifier
-            modifier_match = re.search(r'\bmodifier\s+(\w+)', code_part)
-            if modifier_match:
-                modifier_name = modifier_match.group(1)
-                function_starts.append((line_num, modifier_name, False, True))
-                continue
-            
-            # 检查是否是构造函数 (Solidity 0.5.0+)
-            constructor_match = re.search(r'\bconstructor\s*\(', code_part)
-            if constructor_match:
-                function_starts.append((line_num, 'constructor', True, False))
-                continue
-            
-            # 检查是否是老式构造函数 (Solidity 0.4.x: function ContractName)
-            # 🔧 修复：检查是否匹配任何一个合约名
-            is_old_constructor = False
-            if self.contract_names:
-                for contract_name in self.contract_names:
-                    old_constructor_match = re.search(rf'\bfunction\s+{re.escape(contract_name)}\s*\(', code_part)
-                    if old_constructor_match:
-                        function_starts.append((line_num, 'constructor', True, False))
-                        is_old_constructor = True
-                        break
-            
-            if is_old_constructor:
-                continue
-            
-            # 🔧 检查是否是fallback函数（匿名函数）
-            # Solidity 0.4.x: function() payable public
-            # Solidity 0.6.0+: fallback() / receive()
-            fallback_match = re.search(r'\bfunction\s*\(\s*\)', code_part)
-            if fallback_match:
-                # 检查是否是payable（通常fallback都是payable）
-                is_fallback = True
-                function_starts.append((line_num, 'fallback', False, False, is_fallback))
-                continue
-            
-            # 检查新式fallback/receive
-            if 'fallback()' in code_part or 'receive()' in code_part:
-                func_type = 'receive' if 'receive()' in code_part else 'fallback'
-                function_starts.append((line_num, func_type, False, False, True))
-                continue
-            
-            # 普通函数
-            func_match = re.search(r'function\s+(\w+)', code_part)
-            if func_match:
-                func_name = func_match.group(1)
-                function_starts.append((line_num, func_name, False, False, False))
+        # [(line_num, func_name, is_constructor, is_modifier, is_fallback), ...]
+        function_starts = scan_function_starts(self.source_lines, self.contract_names)
+        
+        # 🔧 新增：记录函数定义行（modifier除外，同名函数取第一个定义）
+        for func_info_tuple in function_starts:
+            if not func_info_tuple[3]:
+                self._function_def_line.setdefault(func_info_tuple[1], func_info_tuple[0])
         
         # 阶段2：为每个函数/modifier分配行号范围
-        for i, func_info_tuple in enumerate(function_starts):
-            # 🔧 兼容新旧格式
-            if len(func_info_tuple) == 5:
-                start_line, func_name, is_constructor, is_modifier, is_fallback = func_info_tuple
-            else:
-                start_line, func_name, is_constructor, is_modifier = func_info_tuple
-                is_fallback = False
+        # 🔧 改进：先一次性预计算每行的大括号增量/缩进，避免逐函数重复做字符串运算
+        self._line_metrics = compute_line_metrics(self.source_lines)
+        for i, (start_line, func_name, is_constructor, is_modifier, is_fallback) in enumerate(function_starts):
             # 函数结束位置：下一个函数开始的前一行，或文件结束
             if i + 1 < len(function_starts):
                 end_line = function_starts[i + 1][0] - 1
             else:
                 end_line = len(self.source_lines)
             
-            # 使用大括号计数+缩进判断精确确定函数结束位置
-            brace_count = 0
-            actual_end = end_line
-            found_opening_brace = False
-            
             # 获取函数定义行的缩进级别
-            func_def_line = self.source_lines[start_line - 1]
-            func_indent = len(func_def_line) - len(func_def_line.lstrip())
+            func_indent = self._line_metrics.indent[start_line - 1]
             
-            for line_num in range(start_line, min(end_line + 1, len(self.source_lines) + 1)):
-                line = self.source_lines[line_num - 1]
-                
-                # 检查是否有左大括号（函数体开始）
-                if '{' in line:
-                    found_opening_brace = True
-                
-                brace_count += line.count('{') - line.count('}')
-                
-                # 函数体完全闭合的条件（关键改进：使用缩进判断）：
-                # 1. 已经找到过左大括号（函数体已开始）
-                # 2. 当前brace_count==0（大括号已经全部配对）
-                # 3. 当前行包含右大括号
-                # 4. 当前行的缩进 <= 函数定义行的缩进（同级或更外层，说明是函数级别的}）
-                if found_opening_brace and brace_count == 0 and '}' in line and line_num > start_line:
-                    line_indent = len(line) - len(line.lstrip())
-                    stripped = line.strip()
-                    
-                    # 是函数级别的} （缩进与函数定义同级或更外层）
-                    if (stripped == '}' or stripped.startswith('}')) and line_indent <= func_indent:
-                        actual_end = line_num
-                        break
+            # 使用大括号计数+缩进判断精确确定函数结束位置
+            actual_end = scan_function_end(self._line_metrics, start_line, end_line, func_indent)
             
             self.function_map[func_name] = {
                 'start_line': start_line,
@@ -149,6 +163,23 @@ class SourceMapper:
                 'is_modifier': is_modifier,  # 标记是否是modifier
                 'is_fallback': is_fallback  # 🔧 新增：标记是否是fallback/receive函数
             }
+        
+        # 🔧 新增：一次性预计算函数分类集合，后续判断只需一次集合成员测试
+        self._constructor_funcs = {n for n, info in self.function_map.items() if info['is_constructor']}
+        self._fallback_funcs = {n for n, info in self.function_map.items() if info['is_fallback']}
+        self._modifier_funcs = {n for n, info in self.function_map.items() if info['is_modifier']}
+        self._skip_funcs = self._constructor_funcs | self._fallback_funcs
+        self._view_pure_funcs = {
+            n for n, def_line in self._function_def_line.items()
+            if 'view' in self.source_lines[def_line - 1] or 'pure' in self.source_lines[def_line - 1]
+        }
+        
+        # 🔧 新增：一次性建立 行 → 所属函数 的映射（按function_map顺序，先出现的函数优先）
+        self._line_to_func = [None] * len(self.source_lines)
+        for func_name, func_info in self.function_map.items():
+            for line_num in func_info['lines']:
+                if self._line_to_func[line_num - 1] is None:
+                    self._line_to_func[line_num - 1] = func_name
     
     def _extract_contract_name(self) -> List[str]:
         """提取所有合约名称（用于识别老式构造函数）
@@ -181,6 +212,7 @@ class SourceMapper:
         
         entries = self.srcmap_runtime.split(';')
         prev_values = [0, 0, 0, '-']  # s, l, f, j
+        prev_offset, prev_line_col = None, None
         
         for entry in entries:
             parts = entry.split(':')
@@ -195,7 +227,11 @@ class SourceMapper:
                         current_values[i] = part
             
             # 计算行号和列号
-            line_num, col_num = self._offset_to_line_col(current_values[0])
+            # 🔧 改进：压缩格式中连续条目常沿用同一起始偏移，此时直接复用上一条的结果
+            if current_values[0] != prev_offset:
+                prev_offset = current_values[0]
+                prev_line_col = self._offset_to_line_col(prev_offset)
+            line_num, col_num = prev_line_col
             
             self.srcmap_entries.append({
                 'offset': current_values[0],  # 字节偏移
@@ -220,35 +256,44 @@ class SourceMapper:
         Returns:
             (line_num, col_num): 行号（从1开始）和列号（从0开始）
         """
-        current_offset = 0
-        
-        for line_num, line in enumerate(self.source_lines, 1):
-            line_length = len(line.encode('utf-8'))
-            
-            if current_offset + line_length > byte_offset:
-                # 找到了对应的行
-                col_num = byte_offset - current_offset
-                return (line_num, col_num)
-            
-            current_offset += line_length
-        
         # 如果超出范围，返回最后一行
-        return (len(self.source_lines), 0)
+        if byte_offset >= len(self._source_bytes):
+            return (len(self.source_lines), 0)
+        
+        # 偏移之前的换行符个数即为行下标
+        line_idx = bisect.bisect_left(self._newline_positions, byte_offset)
+        line_start = self._newline_positions[line_idx - 1] + 1 if line_idx > 0 else 0
+        return (line_idx + 1, byte_offset - line_start)
     
-    def get_source_location_for_pc(self, pc: int, bytecode_instructions: List) -> Dict:
+    def get_source_location_for_pc(self, pc: int, bytecode_instructions: List) -> Optional[SrcLoc]:
         """
         🔧 新增：根据程序计数器（PC）获取源码位置
         
+        同一个PC经常被重复查询，结果按PC缓存（针对同一份指令列表）
+        
         Args:
             pc: EVM程序计数器值
             bytecode_instructions: 反汇编的指令列表
         
         Returns:
-            包含行号、列号、代码片段的字典
+            SrcLoc（行号、列号、代码片段等），找不到时返回None
         """
         if not self.srcmap_entries or not bytecode_instructions:
             return None
         
+        # 指令列表变化时缓存失效
+        if bytecode_instructions is not self._pc_cache_instructions:
+            self._pc_cache_instructions = bytecode_instructions
+            self._pc_location_cache = {}
+        elif pc in self._pc_location_cache:
+            return self._pc_location_cache[pc]
+        
+        location = self._resolve_source_location_for_pc(pc, bytecode_instructions)
+        self._pc_location_cache[pc] = location
+        return location
+    
+    def _resolve_source_location_for_pc(self, pc: int, bytecode_instructions: List) -> Optional[SrcLoc]:
+        """根据PC查找srcmap条目并构造SrcLoc（无缓存）"""
         # 找到PC对应的指令索引
         instr_index = None
         for idx, instr in enumerate(bytecode_instructions):
@@ -265,14 +310,14 @@ class SourceMapper:
         if line_num < 1 or line_num > len(self.source_lines):
             return None
         
-        return {
-            'line': line_num,
-            'column': srcmap_entry['column'],
-            'code': self.source_lines[line_num - 1].strip(),
-            'function': self._find_function_for_line(line_num),
-            'offset': srcmap_entry['offset'],
-            'length': srcmap_entry['length']
-        }
+        return SrcLoc(
+            line=line_num,
+            column=srcmap_entry['column'],
+            code=self._src_stripped[line_num - 1],
+            function=self._find_function_for_line(line_num),
+            offset=srcmap_entry['offset'],
+            length=srcmap_entry['length']
+        )
     
     def map_to_source(self, taint_results: List[Dict], bytecode_analyzer) -> List[Dict]:
         """将污点结果映射到源码"""
@@ -283,204 +328,7 @@ class SourceMapper:
         if hasattr(bytecode_analyzer, 'instructions'):
             self.instructions = bytecode_analyzer.instructions
         
-        mapped_results = []
-        
-        for taint_result in taint_results:
-            var_name = taint_result['name']
-            has_taint = len(taint_result['taint_bb']) > 0
-            
-            # 查找变量在源码中的使用
-            usages = self._find_variable_usage(var_name)
-            
-            # 分析路径类型（新增）
-            dangerous_paths = []  # 无条件判断的危险路径
-            suspicious_paths = []  # 有条件判断的可疑路径
-            
-            if has_taint and 'paths_with_conditions' in taint_result:
-                for path_info in taint_result['paths_with_conditions']:
-                    if path_info['has_condition']:
-                        suspicious_paths.append(path_info['path'])
-                    else:
-                        dangerous_paths.append(path_info['path'])
-            
-            # 标记风险位置（区分危险和可疑）
-            # 关键改进：只检查写入操作，排除读取操作（如条件判断中的变量）
-            dangerous_locations = []
-            suspicious_locations = []
-            
-            # 改进1: 基于污点分析的检测（使用字节码层面的条件信息）
-            # 🔧 关键改进：利用字节码分析得到的路径条件信息，而非源码模式匹配
-            if has_taint:
-                # 构建写入操作到污点路径的映射
-                # 通过检查写入操作所在的基本块是否在有条件的污点路径上
-                for usage in usages:
-                    # 核心修复：只有写入操作才可能是风险位置
-                    if usage['operation'] == 'write':
-                        # 🔧 关键修复1：跳过变量声明（不是运行时风险）
-                        if usage.get('type') == 'declaration':
-                            # 变量声明（如 uint256 constant BET = 100）不是运行时操作
-                            # 不应该被标记为风险
-                            continue
-                        
-                        func_name = usage.get('function')
-                        
-                        # 🔧 关键修复2：跳过构造函数、fallback和view/pure函数中的操作
-                        if func_name:
-                            func_info = self.function_map.get(func_name, {})
-                            if func_info.get('is_constructor', False):
-                                # 构造函数中的操作，直接跳过，不标记为危险
-                                continue
-                            if func_info.get('is_fallback', False):
-                                # 🔧 新增：fallback/receive函数是接收以太币的，不是漏洞
-                                # 例如：捐赠合约的fallback函数接收捐款并更新totalReceive
-                                continue
-                            
-                            # 🔧 新增：跳过view/pure函数中的操作
-                            if self._is_view_or_pure_function(func_name):
-                                # view/pure函数不能修改状态，里面的赋值是给返回值赋值
-                                # 例如：function getPet(...) view returns (uint256 genes) { genes = pet.genes; }
-                                continue
-                            
-                            # 🔧 新增：跳过有访问控制修饰符的函数
-                            # 如果函数使用了onlyOwner、onlyAdmin等修饰符，说明已有保护，不标记为疑似路径
-                            if self._has_access_control_modifier(func_name):
-                                continue
-                        
-                        # 🔧 新方法：利用字节码分析的路径条件信息（增强版）
-                        # 检查是否所有包含此写入的污点路径都有条件判断
-                        has_path_condition = False
-                        has_path_without_condition = False
-                        bytecode_condition_types = []  # 🔧 新增：记录字节码发现的条件类型
-                        bytecode_condition_details = []  # 🔧 新增：详细的条件信息
-                        
-                        if 'paths_with_conditions' in taint_result:
-                            for path_info in taint_result['paths_with_conditions']:
-                                if path_info['has_condition']:
-                                    has_path_condition = True
-                                    # 🔧 新增：收集条件类型
-                                    if 'condition_types' in path_info:
-                                        bytecode_condition_types.extend(path_info['condition_types'])
-                                        bytecode_condition_details.append({
-                                            'types': path_info['condition_types'],
-                                            'count': path_info.get('condition_count', 0)
-                                        })
-                                else:
-                                    has_path_without_condition = True
-                        
-                        # 去重条件类型
-                        bytecode_condition_types = list(set(bytecode_condition_types))
-                        
-                        # 同时检查源码级别的访问控制（作为补充）
-                        has_source_condition = self._check_source_has_condition(usage)
-                        
-                        # 🔧 改进：综合判断（双重验证机制）
-                        has_protection = has_path_condition or has_source_condition
-                        
-                        # 🔧 新增：置信度评估
-                        confidence = self._calculate_confidence(
-                            has_path_condition, 
-                            has_source_condition,
-                            bytecode_condition_types
-                        )
-                        
-                        location_info = usage.copy()
-                        location_info['has_bytecode_condition'] = has_path_condition  # 字节码层面的条件
-                        location_info['has_source_condition'] = has_source_condition  # 源码层面的条件
-                        location_info['bytecode_condition_types'] = bytecode_condition_types  # 🔧 新增
-                        location_info['bytecode_condition_details'] = bytecode_condition_details  # 🔧 新增
-                        location_info['protection_confidence'] = confidence  # 🔧 新增：保护强度置信度
-                        location_info['detection_method'] = 'taint_analysis'
-                        
-                        # 🔧 改进后的逻辑：
-                        # 1. 如果字节码路径或源码都有保护 → 可疑（需人工审查）
-                        # 2. 如果完全没有保护 → 危险（需立即修复）
-                        if has_protection:
-                            suspicious_locations.append(location_info)
-                        else:
-                            dangerous_locations.append(location_info)
-                    # 读取操作（如 if (keyHash == 0x0)）不会被标记为风险
-            
-            # 改进2: 补充检测 - public函数写入关键变量但无访问控制（新增）
-            # 即使污点分析失败，也能通过此机制检测到漏洞
-            for usage in usages:
-                if usage['operation'] == 'write':
-                    # 🔧 关键修复1：跳过变量声明（不是运行时风险）
-                    if usage.get('type') == 'declaration':
-                        # 变量声明不是运行时操作，跳过
-                        continue
-                    
-                    func_name = usage.get('function')
-                    if func_name:
-                        # 🔧 关键修复2：先检查是否是构造函数或fallback
-                        func_info = self.function_map.get(func_name, {})
-                        if func_info.get('is_constructor', False):
-                            # 构造函数中的操作，跳过
-                            continue
-                        if func_info.get('is_fallback', False):
-                            # 🔧 新增：fallback/receive函数，跳过
-                            continue
-                        
-                        # 🔧 新增：跳过view/pure函数
-                        if self._is_view_or_pure_function(func_name):
-                            # view/pure函数不修改状态
-                            continue
-                        
-                        # 🔧 新增：跳过有访问控制修饰符的函数
-                        # 如果函数使用了onlyOwner、onlyAdmin等修饰符，说明已有保护，不标记为疑似路径
-                        if self._has_access_control_modifier(func_name):
-                            continue
-                        
-                        # 检查是否是public函数且无访问控制
-                        has_ac, reason = self._check_public_function_has_access_control(func_name)
-                        
-                        if not has_ac:  # public函数无访问控制
-                            # 检查是否已经被标记（避免重复）
-                            already_flagged = any(
-                                loc['line'] == usage['line'] and loc['function'] == func_name
-                                for loc in dangerous_locations + suspicious_locations
-                            )
-                            
-                            if not already_flagged:
-                                # 🔧 关键修复：即使无访问控制，也要检查是否有条件判断
-                                has_source_condition = self._check_source_has_condition(usage)
-                                
-                                location_info = usage.copy()
-                                location_info['has_source_condition'] = has_source_condition
-                                location_info['detection_method'] = 'public_function_check'
-                                location_info['warning'] = f"⚠️ {reason}"
-                                
-                                # 🔧 根据条件判断决定是危险还是可疑
-                                if has_source_condition:
-                                    # 有条件判断（require/if等） → 可疑
-                                    suspicious_locations.append(location_info)
-                                else:
-                                    # 完全没有条件保护 → 危险
-                                    dangerous_locations.append(location_info)
-            
-            # 重新计算：如果补充检测发现了危险位置，也应标记为有漏洞
-            has_vulnerability = has_taint or len(dangerous_locations) > 0 or len(suspicious_locations) > 0
-            
-            # 🔧 重新计算路径统计：基于实际的危险和可疑位置
-            # 而不是使用污点分析阶段的路径统计（那时候还包含构造函数）
-            actual_dangerous_count = len(dangerous_locations)
-            actual_suspicious_count = len(suspicious_locations)
-            
-            mapped = {
-                'variable': var_name,
-                'storage_slot': taint_result['offset'],
-                'has_taint': has_taint,
-                'has_vulnerability': has_vulnerability,  # 新增：综合判断
-                'taint_paths_count': len(taint_result['taint_cfg']),
-                'dangerous_paths_count': actual_dangerous_count,  # 🔧 修复：使用实际的危险位置数量
-                'suspicious_paths_count': actual_suspicious_count,  # 🔧 修复：使用实际的可疑位置数量
-                'affected_basic_blocks': taint_result['taint_bb'],
-                'source_usages': usages,
-                'dangerous_locations': dangerous_locations,  # 新增：危险位置（无保护）
-                'suspicious_locations': suspicious_locations,  # 新增：可疑位置（有保护）
-                'risk_locations': dangerous_locations + suspicious_locations  # 保持兼容性
-            }
-            
-            mapped_results.append(mapped)
+        mapped_results = [self._map_taint_result(r) for r in taint_results]
         
         # 🔧 改进：检测敏感函数（双重检测：字节码 + 源码）
         print(f"\n{Colors.HEADER}【额外检测】敏感函数分析（双重检测）{Colors.ENDC}")
@@ -506,19 +354,23 @@ class SourceMapper:
         
         if sensitive_functions:
             print(f"\n{Colors.YELLOW}⚠️  综合结果: {len(sensitive_functions)} 个敏感操作{Colors.ENDC}")
+            # 🔧 改进：逐条输出先写入缓冲区，最后一次性写出（避免每行一次print）
+            detection_badges = {
+                'both': '🔴🔵 双重检测',
+                'bytecode': '🔴 字节码',
+                'source': '🔵 源码'
+            }
+            buf = []
+            append = buf.append
             for sf in sensitive_functions:
-                risk_color = Colors.GREEN if sf['has_access_control'] else Colors.RED
                 risk_icon = "✅" if sf['has_access_control'] else "❌"
                 detection_source = sf.get('detection_source', 'source')
-                detection_badge = {
-                    'both': '🔴🔵 双重检测',
-                    'bytecode': '🔴 字节码',
-                    'source': '🔵 源码'
-                }.get(detection_source, detection_source)
+                detection_badge = detection_badges.get(detection_source, detection_source)
                 
-                print(f"  {risk_icon} 行 {sf['line']:4d}: {sf['keyword']} - {sf['description']}")
-                print(f"     检测来源: {detection_badge}")
-                print(f"     函数: {sf['function']}, 访问控制: {sf['control_reason']}")
+                append(f"  {risk_icon} 行 {sf['line']:4d}: {sf['keyword']} - {sf['description']}\n"
+                       f"     检测来源: {detection_badge}\n"
+                       f"     函数: {sf['function']}, 访问控制: {sf['control_reason']}\n")
+            sys.stdout.write(''.join(buf))
         else:
             print(f"{Colors.GREEN}✓ 未发现敏感函数调用{Colors.ENDC}")
         
@@ -541,28 +393,224 @@ class SourceMapper:
         
         return mapped_results
     
+    def _map_taint_result(self, taint_result: Dict) -> Dict:
+        """将单个变量的污点结果映射到源码"""
+        var_name = taint_result['name']
+        has_taint = len(taint_result['taint_bb']) > 0
+        
+        # 查找变量在源码中的使用
+        usages = self._find_variable_usage(var_name)
+        
+        # 分析路径类型（新增）
+        dangerous_paths = []  # 无条件判断的危险路径
+        suspicious_paths = []  # 有条件判断的可疑路径
+        
+        if has_taint and 'paths_with_conditions' in taint_result:
+            for path_info in taint_result['paths_with_conditions']:
+                if path_info['has_condition']:
+                    suspicious_paths.append(path_info['path'])
+                else:
+                    dangerous_paths.append(path_info['path'])
+        
+        # 标记风险位置（区分危险和可疑）
+        # 关键改进：只检查写入操作，排除读取操作（如条件判断中的变量）
+        dangerous_locations = []
+        suspicious_locations = []
+        flagged = set()  # 🔧 新增：已标记的 (行号, 函数名)，用于O(1)去重
+        
+        # 改进1: 基于污点分析的检测（使用字节码层面的条件信息）
+        # 🔧 关键改进：利用字节码分析得到的路径条件信息，而非源码模式匹配
+        if has_taint:
+            # 构建写入操作到污点路径的映射
+            # 通过检查写入操作所在的基本块是否在有条件的污点路径上
+            for usage in usages:
+                # 核心修复：只有写入操作才可能是风险位置
+                if usage['operation'] == 'write':
+                    # 🔧 关键修复1：跳过变量声明（不是运行时风险）
+                    if usage.get('type') == 'declaration':
+                        # 变量声明（如 uint256 constant BET = 100）不是运行时操作
+                        # 不应该被标记为风险
+                        continue
+                    
+                    func_name = usage.get('function')
+                    
+                    # 🔧 关键修复2：跳过构造函数、fallback和view/pure函数中的操作
+                    if func_name:
+                        if func_name in self._skip_funcs:
+                            # 构造函数中的操作，直接跳过，不标记为危险
+                            # 🔧 新增：fallback/receive函数是接收以太币的，不是漏洞
+                            # 例如：捐赠合约的fallback函数接收捐款并更新totalReceive
+                            continue
+                        
+                        # 🔧 新增：跳过view/pure函数中的操作
+                        if func_name in self._view_pure_funcs:
+                            # view/pure函数不能修改状态，里面的赋值是给返回值赋值
+                            # 例如：function getPet(...) view returns (uint256 genes) { genes = pet.genes; }
+                            continue
+                        
+                        # 🔧 新增：跳过有访问控制修饰符的函数
+                        # 如果函数使用了onlyOwner、onlyAdmin等修饰符，说明已有保护，不标记为疑似路径
+                        if self._has_access_control_modifier(func_name):
+                            continue
+                    
+                    # 🔧 新方法：利用字节码分析的路径条件信息（增强版）
+                    # 检查是否所有包含此写入的污点路径都有条件判断
+                    has_path_condition = False
+                    has_path_without_condition = False
+                    bytecode_condition_types = []  # 🔧 新增：记录字节码发现的条件类型
+                    bytecode_condition_details = []  # 🔧 新增：详细的条件信息
+                    
+                    if 'paths_with_conditions' in taint_result:
+                        for path_info in taint_result['paths_with_conditions']:
+                            if path_info['has_condition']:
+                                has_path_condition = True
+                                # 🔧 新增：收集条件类型
+                                if 'condition_types' in path_info:
+                                    bytecode_condition_types.extend(path_info['condition_types'])
+                                    bytecode_condition_details.append({
+                                        'types': path_info['condition_types'],
+                                        'count': path_info.get('condition_count', 0)
+                                    })
+                            else:
+                                has_path_without_condition = True
+                    
+                    # 去重条件类型
+                    bytecode_condition_types = list(set(bytecode_condition_types))
+                    
+                    # 同时检查源码级别的访问控制（作为补充）
+                    has_source_condition = self._check_source_has_condition(usage)
+                    
+                    # 🔧 改进：综合判断（双重验证机制）
+                    has_protection = has_path_condition or has_source_condition
+                    
+                    # 🔧 新增：置信度评估
+                    confidence = self._calculate_confidence(
+                        has_path_condition, 
+                        has_source_condition,
+                        bytecode_condition_types
+                    )
+                    
+                    location_info = usage.copy()
+                    location_info['has_bytecode_condition'] = has_path_condition  # 字节码层面的条件
+                    location_info['has_source_condition'] = has_source_condition  # 源码层面的条件
+                    location_info['bytecode_condition_types'] = bytecode_condition_types  # 🔧 新增
+                    location_info['bytecode_condition_details'] = bytecode_condition_details  # 🔧 新增
+                    location_info['protection_confidence'] = confidence  # 🔧 新增：保护强度置信度
+                    location_info['detection_method'] = 'taint_analysis'
+                    
+                    # 🔧 改进后的逻辑：
+                    # 1. 如果字节码路径或源码都有保护 → 可疑（需人工审查）
+                    # 2. 如果完全没有保护 → 危险（需立即修复）
+                    if has_protection:
+                        suspicious_locations.append(location_info)
+                    else:
+                        dangerous_locations.append(location_info)
+                    flagged.add((usage['line'], func_name))
+                # 读取操作（如 if (keyHash == 0x0)）不会被标记为风险
+        
+        # 改进2: 补充检测 - public函数写入关键变量但无访问控制（新增）
+        # 即使污点分析失败，也能通过此机制检测到漏洞
+        for usage in usages:
+            if usage['operation'] == 'write':
+                # 🔧 关键修复1：跳过变量声明（不是运行时风险）
+                if usage.get('type') == 'declaration':
+                    # 变量声明不是运行时操作，跳过
+                    continue
+                
+                func_name = usage.get('function')
+                if func_name:
+                    # 🔧 关键修复2：先检查是否是构造函数或fallback/receive函数，跳过
+                    if func_name in self._skip_funcs:
+                        continue
+                    
+                    # 🔧 新增：跳过view/pure函数
+                    if func_name in self._view_pure_funcs:
+                        # view/pure函数不修改状态
+                        continue
+                    
+                    # 🔧 新增：跳过有访问控制修饰符的函数
+                    # 如果函数使用了onlyOwner、onlyAdmin等修饰符，说明已有保护，不标记为疑似路径
+                    if self._has_access_control_modifier(func_name):
+                        continue
+                    
+                    # 检查是否是public函数且无访问控制
+                    has_ac, reason = self._check_public_function_has_access_control(func_name)
+                    
+                    if not has_ac:  # public函数无访问控制
+                        # 检查是否已经被标记（避免重复）
+                        if (usage['line'], func_name) not in flagged:
+                            # 🔧 关键修复：即使无访问控制，也要检查是否有条件判断
+                            has_source_condition = self._check_source_has_condition(usage)
+                            
+                            location_info = usage.copy()
+                            location_info['has_source_condition'] = has_source_condition
+                            location_info['detection_method'] = 'public_function_check'
+                            location_info['warning'] = f"⚠️ {reason}"
+                            
+                            # 🔧 根据条件判断决定是危险还是可疑
+                            if has_source_condition:
+                                # 有条件判断（require/if等） → 可疑
+                                suspicious_locations.append(location_info)
+                            else:
+                                # 完全没有条件保护 → 危险
+                                dangerous_locations.append(location_info)
+                            flagged.add((usage['line'], func_name))
+        
+        # 重新计算：如果补充检测发现了危险位置，也应标记为有漏洞
+        has_vulnerability = has_taint or len(dangerous_locations) > 0 or len(suspicious_locations) > 0
+        
+        # 🔧 重新计算路径统计：基于实际的危险和可疑位置
+        # 而不是使用污点分析阶段的路径统计（那时候还包含构造函数）
+        actual_dangerous_count = len(dangerous_locations)
+        actual_suspicious_count = len(suspicious_locations)
+        
+        mapped = {
+            'variable': var_name,
+            'storage_slot': taint_result['offset'],
+            'has_taint': has_taint,
+            'has_vulnerability': has_vulnerability,  # 新增：综合判断
+            'taint_paths_count': len(taint_result['taint_cfg']),
+            'dangerous_paths_count': actual_dangerous_count,  # 🔧 修复：使用实际的危险位置数量
+            'suspicious_paths_count': actual_suspicious_count,  # 🔧 修复：使用实际的可疑位置数量
+            'affected_basic_blocks': taint_result['taint_bb'],
+            'source_usages': usages,
+            'dangerous_locations': dangerous_locations,  # 新增：危险位置（无保护）
+            'suspicious_locations': suspicious_locations,  # 新增：可疑位置（有保护）
+            'risk_locations': dangerous_locations + suspicious_locations  # 保持兼容性
+        }
+        
+        return mapped
+    
     def _find_variable_usage(self, var_name: str) -> List[Dict]:
         """查找变量使用位置"""
         usages = []
         
-        for line_num, line in enumerate(self.source_lines, 1):
-            if re.search(rf'\b{var_name}\b', line):
-                usage_type = 'declaration' if any(kw in line for kw in 
-                    ['uint', 'address', 'bool', 'mapping', 'string']) else 'usage'
-                
-                # 改进的操作类型识别
-                operation = self._determine_operation_type(line, var_name)
-                
-                usages.append({
-                    'line': line_num,
-                    'code': line.strip(),
-                    'type': usage_type,
-                    'operation': operation,
-                    'function': self._find_function_for_line(line_num)
-                })
+        for line_num in self._lines_with_word(var_name):
+            line = self.source_lines[line_num - 1]
+            usage_type = 'declaration' if any(kw in line for kw in 
+                ['uint', 'address', 'bool', 'mapping', 'string']) else 'usage'
+            
+            # 改进的操作类型识别
+            operation = self._determine_operation_type(line, var_name)
+            
+            usages.append({
+                'line': line_num,
+                'code': self._src_stripped[line_num - 1],
+                'type': usage_type,
+                'operation': operation,
+                'function': self._find_function_for_line(line_num)
+            })
         
         return usages
     
+    def _lines_with_word(self, word: str) -> List[int]:
+        """🔧 新增：通过倒排索引查询包含该单词的行号（升序）"""
+        if _WORD_RE.fullmatch(word):
+            return self._word_index.get(word, [])
+        # 非标识符（含特殊字符）无法走索引，回退到逐行正则匹配
+        return [line_num for line_num, line in enumerate(self.source_lines, 1)
+                if re.search(rf'\b{word}\b', line)]
+    
     def _determine_operation_type(self, line: str, var_name: str) -> str:
         """
         准确判断变量操作类型
@@ -597,12 +645,7 @@ class SourceMapper:
             return 'write'
         
         # 优先级3: 检查是否在条件判断中（读取操作）
-        if any(keyword in code_part for keyword in [
-            'if (', 'if(', 
-            'require(', 'require (', 
-            'assert(', 'assert (',
-            'return ', 'return(',
-        ]):
+        if _READ_CONTEXT_RE.search(code_part):
             # 在条件判断/返回语句中的使用都是读取
             return 'read'
         
@@ -635,25 +678,27 @@ class SourceMapper:
     
     def _find_function_for_line(self, line_num: int) -> Optional[str]:
         """找到行所属的函数"""
-        for func_name, func_info in self.function_map.items():
-            if line_num in func_info['lines']:
-                return func_name
+        # 🔧 改进：直接查预先建立的 行 → 函数 映射
+        if 0 <= line_num - 1 < len(self._line_to_func):
+            return self._line_to_func[line_num - 1]
         return None
     
+    def _function_decl_lines(self, func_name: str) -> List[str]:
+        """🔧 新增：包含 'function 函数名' 的源码行（每个函数只扫描一次源码）"""
+        decl_lines = self._decl_lines_cache.get(func_name)
+        if decl_lines is None:
+            pattern = f'function {func_name}'
+            decl_lines = [line for line in self.source_lines if pattern in line]
+            self._decl_lines_cache[func_name] = decl_lines
+        return decl_lines
+    
     def _is_view_or_pure_function(self, func_name: str) -> bool:
         """🔧 新增：检查函数是否是view或pure函数"""
         if not func_name:
             return False
         
-        # 在源码中查找函数定义
-        for line in self.source_lines:
-            if f'function {func_name}' in line:
-                # 检查是否包含 view 或 pure 关键字
-                if 'view' in line or 'pure' in line:
-                    return True
-                break
-        
-        return False
+        # 🔧 改进：函数定义行已在解析阶段检查过，直接查集合
+        return func_name in self._view_pure_funcs
     
     def _check_public_function_has_access_control(self, func_name: str):
         """
@@ -666,21 +711,28 @@ class SourceMapper:
         if not func_name:
             return False, "未知函数"
         
+        # 🔧 新增：同一函数常被多次查询（多个敏感操作位于同一函数），结果按函数名缓存
+        cached = self._public_acl_cache.get(func_name)
+        if cached is None:
+            cached = self._public_acl_cache[func_name] = self._compute_public_function_access_control(func_name)
+        return cached
+    
+    def _compute_public_function_access_control(self, func_name: str):
+        """检查public函数是否有访问控制（未缓存的实际判断逻辑）"""
         # 🔧 新增：检查是否是构造函数
-        func_info = self.function_map.get(func_name, {})
-        if func_info.get('is_constructor', False):
+        if func_name in self._constructor_funcs:
             return True, "构造函数（仅部署时执行一次，安全）"
         
         # 🔧 新增：检查是否是modifier
-        if func_info.get('is_modifier', False):
+        if func_name in self._modifier_funcs:
             return True, "modifier（由其他函数调用，本身不是漏洞点）"
         
         # 🔧 新增：检查是否是fallback/receive函数
-        if func_info.get('is_fallback', False):
+        if func_name in self._fallback_funcs:
             return True, "fallback/receive函数（接收以太币的函数，任何人都应该能调用）"
         
         # 🔧 新增：检查是否是view/pure函数
-        if self._is_view_or_pure_function(func_name):
+        if func_name in self._view_pure_funcs:
             return True, "view/pure函数（只读函数，不修改状态，无需访问控制）"
         
         # 检查函数定义
@@ -696,37 +748,19 @@ class SourceMapper:
                     return True, "非public函数"
                 
                 # 检查是否有访问控制modifier
-                # 🔧 改进：使用更全面的模式匹配
-                access_control_patterns = [
-                    # 常见的owner相关修饰符
-                    'onlyOwner', 'onlyowner', 'ownerOnly', 'OwnerOnly',
-                    # admin相关修饰符
-                    'onlyAdmin', 'onlyadmin', 'adminOnly', 'AdminOnly',
-                    # 其他通用访问控制修饰符
-                    'onlyAuthorized', 'onlyMinter', 'onlyBurner', 'onlyGovernance',
-                    'onlyController', 'onlyManager', 'onlyWhitelisted',
-                    # is开头的检查
-                    'isOwner', 'isAdmin', 'isAuthorized', 'isMinter',
-                    # 状态控制修饰符
-                    'whenNotPaused', 'whenPaused', 'notPaused',
-                    # 安全相关修饰符
-                    'nonReentrant', 'noReentrancy', 'reentrancyGuard',
-                    # 其他常见模式
-                    'senderIsOwner', 'onlyBy', 'restricted', 'protected'
-                ]
-                if any(modifier in line for modifier in access_control_patterns):
+                # 🔧 改进：使用更全面的模式匹配（预编译正则一次扫描）
+                if _ACCESS_CONTROL_MODIFIER_RE.search(line):
                     return True, f"有访问控制modifier"
         
         # 检查函数体内是否有访问控制
         func_lines = self.function_map.get(func_name, {}).get('lines', [])
-        access_control_patterns = ['msg.sender', 'tx.origin', 'owner', 'admin']
         
         for func_line_num in func_lines:
             if 0 <= func_line_num - 1 < len(self.source_lines):
                 line = self.source_lines[func_line_num - 1]
                 
-                if any(keyword in line for keyword in ['require(', 'require ', 'assert(']):
-                    if any(pattern in line for pattern in access_control_patterns):
+                if _REQUIRE_RE.search(line):
+                    if _ACCESS_SUBJECT_RE.search(line):
                         return True, f"有require访问控制"
         
         return False, "public函数无访问控制"
@@ -747,11 +781,18 @@ class SourceMapper:
             'callcode': '代码调用（已弃用）',
         }
         
-        for line_num, line in enumerate(self.source_lines, 1):
+        # 🔧 改进：通过倒排索引筛选候选行（只检查包含敏感关键词的行）
+        candidate_lines = set()
+        for word, line_nums in self._word_index.items():
+            lowered = word.lower()
+            if any(keyword in lowered for keyword in sensitive_keywords):
+                candidate_lines.update(line_nums)
+        
+        for line_num in sorted(candidate_lines):
             # 🔧 改进：跳过注释行（减少误报）
-            stripped = line.strip()
-            if stripped.startswith('//') or stripped.startswith('*') or stripped.startswith('/*'):
+            if self._src_is_comment[line_num - 1]:
                 continue
+            line = self.source_lines[line_num - 1]
             
             for keyword, description in sensitive_keywords.items():
                 if keyword in line.lower():
@@ -770,7 +811,7 @@ class SourceMapper:
                     
                     sensitive_functions.append({
                         'line': line_num,
-                        'code': line.strip(),
+                        'code': self._src_stripped[line_num - 1],
                         'keyword': keyword,
                         'description': description,
                         'function': func_name,
@@ -811,7 +852,7 @@ class SourceMapper:
                 if line:
                     bytecode_mapped.append({
                         'line': line,
-                        'code': self.source_lines[line - 1].strip() if line <= len(self.source_lines) else '',
+                        'code': self._src_stripped[line - 1] if line <= len(self.source_lines) else '',
                         'keyword': op['opcode'].lower(),
                         'description': op['description'],
                         'function': self._find_function_for_line(line),
@@ -826,14 +867,13 @@ class SourceMapper:
         bytecode_lines_set = {bf['line'] for bf in bytecode_mapped}
         
         # 1. 源码检测到的（包括双重检测的）
+        # 🔧 改进：源码检测结果由 _check_sensitive_functions 新建，直接原地标记，不再复制
+        # （同一行可能有多个敏感关键词，因此保留列表而不按行号合并）
         for sf in source_funcs:
             # 检查是否也被字节码检测到（双重验证）
             if sf['line'] in bytecode_lines_set:
-                sf_copy = sf.copy()
-                sf_copy['detection_source'] = 'both'  # 双重验证
-                merged.append(sf_copy)
-            else:
-                merged.append(sf)
+                sf['detection_source'] = 'both'  # 双重验证
+            merged.append(sf)
         
         # 2. 仅字节码检测到的（源码可能被混淆或优化）
         for bf in bytecode_mapped:
@@ -858,22 +898,36 @@ class SourceMapper:
             return None
         
         offset = bytecode_op['offset']
+        self._ensure_offset_index()
         
         # 方法1：直接通过srcmap条目查找
-        for idx, instr in enumerate(self.instructions if hasattr(self, 'instructions') else []):
-            if instr.get('offset') == offset and idx < len(self.srcmap_entries):
-                return self.srcmap_entries[idx]['line']
+        # 🔧 改进：偏移 → 指令下标 O(1) 查找
+        idx = self._offset_to_idx.get(offset)
+        if idx is not None and idx < len(self.srcmap_entries):
+            return self.srcmap_entries[idx]['line']
         
         # 方法2：通过基本块查找（如果有）
         bb_start = bytecode_op.get('basic_block', -1)
         if bb_start >= 0:
             # 查找该基本块的第一条指令对应的源码行
-            for idx, instr in enumerate(self.instructions if hasattr(self, 'instructions') else []):
-                if instr.get('offset') >= bb_start and idx < len(self.srcmap_entries):
-                    return self.srcmap_entries[idx]['line']
+            # 🔧 改进：指令偏移升序，二分查找第一条偏移 >= bb_start 的指令
+            idx = bisect.bisect_left(self._instr_offsets, bb_start)
+            if idx < len(self._instr_offsets) and idx < len(self.srcmap_entries):
+                return self.srcmap_entries[idx]['line']
         
         return None
     
+    def _ensure_offset_index(self):
+        """🔧 新增：（按需）建立指令偏移索引，指令列表变化时重建"""
+        instructions = getattr(self, 'instructions', None) or []
+        if self._offset_index_instructions is instructions:
+            return
+        self._offset_index_instructions = instructions
+        self._instr_offsets = [instr['offset'] for instr in instructions]
+        self._offset_to_idx = {}
+        for idx, off in enumerate(self._instr_offsets):
+            self._offset_to_idx.setdefault(off, idx)
+    
     def _check_source_has_condition(self, usage: Dict) -> bool:
         """
         🔧 修复：检查源码位置是否有**任何**条件判断
@@ -896,50 +950,22 @@ class SourceMapper:
         
         # 优先级1: 检查函数是否有访问控制modifier
         if func_name:
-            for line in self.source_lines:
-                if f'function {func_name}' in line:
-                    # 🔧 改进：检查常见的访问控制modifier（更全面的模式）
-                    access_control_patterns = [
-                        # 常见的owner相关修饰符
-                        'onlyOwner', 'onlyowner', 'ownerOnly', 'OwnerOnly',
-                        # admin相关修饰符
-                        'onlyAdmin', 'onlyadmin', 'adminOnly', 'AdminOnly',
-                        # 其他通用访问控制修饰符
-                        'onlyAuthorized', 'onlyMinter', 'onlyBurner', 'onlyGovernance',
-                        'onlyController', 'onlyManager', 'onlyWhitelisted',
-                        # is开头的检查
-                        'isOwner', 'isAdmin', 'isAuthorized', 'isMinter',
-                        # 状态控制修饰符
-                        'whenNotPaused', 'whenPaused', 'notPaused',
-                        # 安全相关修饰符
-                        'nonReentrant', 'noReentrancy', 'reentrancyGuard',
-                        # 其他常见模式
-                        'senderIsOwner', 'onlyBy', 'restricted', 'protected'
-                    ]
-                    if any(modifier in line for modifier in access_control_patterns):
-                        return True
+            for line in self._function_decl_lines(func_name):
+                # 🔧 改进：检查常见的访问控制modifier（更全面的模式）
+                if _ACCESS_CONTROL_MODIFIER_RE.search(line):
+                    return True
         
         # 🔧 优先级2: 检查函数内是否有**任何**条件判断（不仅限于访问控制）
         if func_name:
             func_lines = self.function_map.get(func_name, {}).get('lines', [])
             if func_lines:
-                for func_line_num in func_lines:
-                    # 只检查当前写入行之前的行（条件保护应该在赋值之前）
-                    if func_line_num >= line_num:
-                        continue
-                    
-                    if 0 <= func_line_num - 1 < len(self.source_lines):
-                        line = self.source_lines[func_line_num - 1]
-                        
-                        # 🔧 关键修复：检查任何require/assert/if语句
-                        if any(keyword in line for keyword in [
-                            'require(', 'require (', 
-                            'assert(', 'assert (',
-                            'revert(', 'revert (',
-                            'if (', 'if(',
-                            'throw', 'throw;'  # Solidity 0.4.x
-                        ]):
-                            return True  # 🔧 有任何条件就返回True
+                # 只检查当前写入行之前的行（条件保护应该在赋值之前）
+                # 🔧 改进：函数行号连续，直接切片，无需逐行判断范围
+                before_write = self.source_lines[func_lines[0] - 1:max(0, min(func_lines[-1], line_num - 1))]
+                for line in before_write:
+                    # 🔧 关键修复：检查任何require/assert/if语句
+                    if _CONDITION_RE.search(line):
+                        return True  # 🔧 有任何条件就返回True
                 
                 # ✅ 如果函数已识别，优先使用函数内检测，直接返回False（无条件）
                 return False
@@ -948,25 +974,19 @@ class SourceMapper:
         # ⚠️ 重要：只检查同一作用域内的行，避免误把其他函数的条件当成保护
         check_range = 5  # 🔧 缩小范围到5行（从10改为5）
         
-        for i in range(max(0, line_num - 1 - check_range), line_num - 1):
-            if i < len(self.source_lines):
-                line = self.source_lines[i]
-                
-                # 🔧 跳过函数声明行（避免跨函数检测）
-                if 'function ' in line or '}' in line.strip():
-                    continue
-                
-                # 🔧 检查任何条件语句
-                if any(keyword in line for keyword in [
-                    'require(', 'require (', 
-                    'assert(', 'assert (',
-                    'if (', 'if(',
-                    'throw', 'throw;'
-                ]):
-                    # 🔧 额外验证：不是注释
-                    stripped = line.strip()
-                    if not stripped.startswith('//') and not stripped.startswith('*'):
-                        return True
+        window_start = max(0, line_num - 1 - check_range)
+        window_end = max(0, line_num - 1)
+        for line, stripped in zip(self.source_lines[window_start:window_end],
+                                  self._src_stripped[window_start:window_end]):
+            # 🔧 跳过函数声明行（避免跨函数检测）
+            if 'function ' in line or '}' in line:
+                continue
+            
+            # 🔧 检查任何条件语句
+            if _NEARBY_CONDITION_RE.search(line):
+                # 🔧 额外验证：不是注释（/* 开头的行不算，与原逻辑一致）
+                if not stripped.startswith(('//', '*')):
+                    return True
         
         return False
     
@@ -987,34 +1007,17 @@ class SourceMapper:
         if not func_name:
             return False
         
-        # 定义访问控制修饰符模式（与上面保持一致）
-        access_control_patterns = [
-            # 常见的owner相关修饰符
-            'onlyOwner', 'onlyowner', 'ownerOnly', 'OwnerOnly',
-            # admin相关修饰符
-            'onlyAdmin', 'onlyadmin', 'adminOnly', 'AdminOnly',
-            # 其他通用访问控制修饰符
-            'onlyAuthorized', 'onlyMinter', 'onlyBurner', 'onlyGovernance',
-            'onlyController', 'onlyManager', 'onlyWhitelisted',
-            # is开头的检查
-            'isOwner', 'isAdmin', 'isAuthorized', 'isMinter',
-            # 状态控制修饰符
-            'whenNotPaused', 'whenPaused', 'notPaused',
-            # 安全相关修饰符
-            'nonReentrant', 'noReentrancy', 'reentrancyGuard',
-            # 其他常见模式
-            'senderIsOwner', 'onlyBy', 'restricted', 'protected'
-        ]
-        
-        # 在源码中查找函数定义
-        for line in self.source_lines:
-            if f'function {func_name}' in line:
-                # 检查是否包含任何访问控制modifier
-                if any(modifier in line for modifier in access_control_patterns):
-                    return True
-                break
-        
-        return False
+        # 🔧 新增：每个函数只判断一次
+        cached = self._acl_modifier_cache.get(func_name)
+        if cached is not None:
+            return cached
+        
+        # 在源码中查找函数定义（只看第一个定义行）
+        decl_lines = self._function_decl_lines(func_name)
+        # 检查是否包含任何访问控制modifier
+        result = bool(decl_lines) and _ACCESS_CONTROL_MODIFIER_RE.search(decl_lines[0]) is not None
+        self._acl_modifier_cache[func_name] = result
+        return result
     
     def _calculate_confidence(self, has_bytecode_condition: bool, has_source_condition: bool, 
                              bytecode_condition_types: List[str]) -> str:
@@ -1088,8 +1091,8 @@ class SourceMapper:
             'taint_to_sensitive_flows': taint_to_sensitive or []  # 🔧 新增
         }
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(data_to_save, f, indent=2, ensure_ascii=False)
+        # 🔧 改进：优先使用orjson序列化（带写缓冲）
+        write_json(output_file, data_to_save)
         
         print(f"  → 源码映射结果: {output_file}")
 
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+源码扫描模块（函数边界识别）
+
+从 SourceMapper._load_and_parse_source 中拆出的两个逐行热循环。
+只使用带类型注解的纯函数和预编译正则，便于按需用 mypyc/Cython 编译；
+未编译时作为普通 Python 模块直接导入。
+"""
+
+import re
+from array import array
+from typing import List, NamedTuple, Sequence, Tuple
+
+# (行号, 函数名, 是否构造函数, 是否modifier, 是否fallback/receive)
+FunctionStart = Tuple[int, str, bool, bool, bool]
+
+
+class LineMetrics(NamedTuple):
+    """每行预计算的大括号/缩进信息"""
+    brace_delta: array    # '{' 数量 - '}' 数量
+    indent: array         # 行首空白长度
+    has_open: bytearray   # 是否包含 '{'
+    close_start: bytearray  # 去除行首空白后是否以 '}' 开头
+
+
+# 单次扫描完成行分类（命名分组区分类别）
+_LINE_CLASSIFIER = re.compile(
+    r'(?P<mod>\bmodifier\s+(?P<mod_name>\w+))'
+    r'|(?P<ctor>\bconstructor\s*\()'
+    r'|(?P<fb>\bfunction\s*\(\s*\))'
+    r'|(?P<fn>function\s+(?P<fn_name>\w+)(?P<fn_paren>\s*\()?)'
+)
+
+# 关键词预过滤：不包含任何关键词的行（绝大多数代码行）直接跳过正则
+_LINE_KEYWORDS = ('function', 'modifier', 'constructor', 'fallback()', 'receive()')
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == '_'
+
+
+def scan_function_starts(source_lines: Sequence[str],
+                         contract_names: Sequence[str]) -> List[FunctionStart]:
+    """
+    阶段1：找到所有函数/modifier定义（排除单行注释）
+
+    先用关键词预过滤，再用一个组合正则扫描该行，按以下优先级分类：
+    modifier > constructor > 老式构造函数 > function() > fallback()/receive() > 普通函数
+
+    Args:
+        source_lines: 源码行列表
+        contract_names: 文件中的合约名（用于识别老式构造函数）
+
+    Returns:
+        [(line_num, func_name, is_constructor, is_modifier, is_fallback), ...]
+    """
+    contract_name_set = set(contract_names)
+
+    function_starts: List[FunctionStart] = []
+    line_num = 0
+    for line in source_lines:
+        line_num += 1
+        code_part = line.split('//')[0]  # 移除单行注释
+
+        if not any(keyword in code_part for keyword in _LINE_KEYWORDS):
+            continue
+
+        modifier_name = None
+        has_constructor = False
+        has_old_constructor = False
+        has_fallback = False
+        func_name = None
+
+        # 允许匹配重叠（从上一个匹配的下一个字符继续），避免前一个匹配吞掉后面的关键词
+        m = _LINE_CLASSIFIER.search(code_part)
+        while m is not None:
+            if m.group('mod') is not None:
+                if modifier_name is None:
+                    modifier_name = m.group('mod_name')
+            elif m.group('ctor') is not None:
+                has_constructor = True
+            elif m.group('fb') is not None:
+                has_fallback = True
+            else:
+                name = m.group('fn_name')
+                if func_name is None:
+                    func_name = name
+                # 老式构造函数 (Solidity 0.4.x: function ContractName(...))
+                start = m.start()
+                if (name in contract_name_set and m.group('fn_paren') is not None
+                        and (start == 0 or not _is_word_char(code_part[start - 1]))):
+                    has_old_constructor = True
+            m = _LINE_CLASSIFIER.search(code_part, m.start() + 1)
+
+        if modifier_name is not None:
+            function_starts.append((line_num, modifier_name, False, True, False))
+        elif has_constructor or has_old_constructor:
+            # 构造函数 (Solidity 0.5.0+ constructor(...) 或老式同名函数)
+            function_starts.append((line_num, 'constructor', True, False, False))
+        elif has_fallback:
+            # fallback函数（匿名函数）Solidity 0.4.x: function() payable public
+            function_starts.append((line_num, 'fallback', False, False, True))
+        elif 'fallback()' in code_part or 'receive()' in code_part:
+            # 新式fallback/receive (Solidity 0.6.0+)
+            func_type = 'receive' if 'receive()' in code_part else 'fallback'
+            function_starts.append((line_num, func_type, False, False, True))
+        elif func_name is not None:
+            # 普通函数
+            function_starts.append((line_num, func_name, False, False, False))
+
+    return function_starts
+
+
+def compute_line_metrics(source_lines: Sequence[str]) -> LineMetrics:
+    """
+    一次性预计算每行的大括号/缩进信息，阶段2只需遍历整数数组
+
+    Returns:
+        LineMetrics(brace_delta, indent, has_open, close_start)，均按行下标(0起)索引
+    """
+    brace_delta = array('i')
+    indent = array('i')
+    has_open = bytearray()
+    close_start = bytearray()
+
+    for line in source_lines:
+        stripped = line.lstrip()
+        brace_delta.append(line.count('{') - line.count('}'))
+        indent.append(len(line) - len(stripped))
+        has_open.append(1 if '{' in line else 0)
+        close_start.append(1 if stripped.startswith('}') else 0)
+
+    return LineMetrics(brace_delta, indent, has_open, close_start)
+
+
+def scan_function_end(metrics: LineMetrics, start_line: int,
+                      end_line: int, func_indent: int) -> int:
+    """
+    阶段2：使用大括号计数+缩进判断精确确定函数结束行
+
+    函数体完全闭合的条件：
+    1. 已经找到过左大括号（函数体已开始）
+    2. 当前brace_count==0（大括号已经全部配对）
+    3. 当前行以右大括号开头
+    4. 当前行的缩进 <= 函数定义行的缩进（函数级别的}）
+
+    Returns:
+        函数结束行号；未找到闭合大括号时返回 end_line
+    """
+    brace_delta = metrics.brace_delta
+    indent = metrics.indent
+    has_open = metrics.has_open
+    close_start = metrics.close_start
+
+    brace_count = 0
+    found_opening_brace = False
+    last_idx = min(end_line, len(brace_delta))
+
+    for idx in range(start_line - 1, last_idx):
+        if has_open[idx]:
+            found_opening_brace = True
+
+        brace_count += brace_delta[idx]
+
+        if (found_opening_brace and brace_count == 0 and close_start[idx]
+                and idx >= start_line and indent[idx] <= func_indent):
+            return idx + 1
+
+    return end_line
@@ -4,20 +4,69 @@
 污点分析模块
 """
 
-import json
 import os
-from typing import List, Dict
+from collections import deque
+from typing import List, Dict, FrozenSet, Optional, Set
 from utils.colors import Colors
+from utils.json_io import JsonlWriter, write_json
+from .bytecode import push_value
+from .cfg_kernels import build_csr_graph
+
+
+# 基本块条件特征位
+COND_JUMPI = 1    # 条件跳转
+COND_COMPARE = 2  # 比较操作
+COND_REVERT = 4   # 回滚
+COND_CALLER = 8   # 调用者读取（CALLER/ORIGIN）
+
+# 构成“条件判断”的特征位（JUMPI、比较、回滚）
+COND_ANY = COND_JUMPI | COND_COMPARE | COND_REVERT
+
+# 操作码 → 条件特征位
+_OPCODE_COND_BITS = {
+    'JUMPI': COND_JUMPI,
+    'EQ': COND_COMPARE, 'LT': COND_COMPARE, 'GT': COND_COMPARE,
+    'SLT': COND_COMPARE, 'SGT': COND_COMPARE, 'ISZERO': COND_COMPARE,
+    'REVERT': COND_REVERT,
+    'CALLER': COND_CALLER, 'ORIGIN': COND_CALLER,
+}
+
+# 污点源操作码（外部可控输入）
+TAINT_SOURCE_OPS = frozenset({
+    'CALLDATALOAD', 'CALLDATACOPY', 'CALLER', 'ORIGIN',
+    'CALLVALUE', 'GASPRICE', 'COINBASE', 'TIMESTAMP',
+    'NUMBER', 'DIFFICULTY', 'GASLIMIT',
+})
+
+# 敏感操作参数的直接污点来源
+PARAM_TAINT_SOURCE_OPS = frozenset({'CALLER', 'ORIGIN', 'CALLDATALOAD', 'CALLDATACOPY', 'CALLVALUE'})
+
+# 条件特征位 → 条件类型名
+_COND_TYPE_NAMES = {
+    COND_JUMPI: 'conditional_jump',
+    COND_COMPARE: 'comparison',
+    COND_REVERT: 'revert',
+}
 
 
 class TaintAnalyzer:
     """污点分析器"""
     
-    def __init__(self, bytecode_analyzer, output_dir: str):
+    def __init__(self, bytecode_analyzer, output_dir: str, max_paths: Optional[int] = None):
         self.bytecode_analyzer = bytecode_analyzer
         self.output_dir = output_dir
+        self.max_paths = max_paths  # 🔧 新增：每个变量最多枚举的路径数（None表示不限制，0表示只做可达性分析）
         self.taint_results = []
         self.taint_to_sensitive_flows = []  # 🔧 新增：污点到敏感函数的流
+        self._bb_by_start = {}  # 🔧 新增：基本块起始偏移 → 基本块
+        self._bb_index_source = None  # 索引对应的基本块列表
+        self._path_cond_cache = {}  # 🔧 新增：路径元组 → (条件类型元组, 条件数量)
+        self._slot_candidate_cache = {}  # 🔧 新增：id(指令列表) → (指令列表, {指令下标: 候选槽位})
+        self._sstore_slots_by_bb = {}  # 🔧 新增：基本块起始偏移 → 该块SSTORE写入的槽位集合
+        self._bb_cond_info = {}  # 🔧 新增：基本块起始偏移 → (条件特征位, 特征位首次出现顺序, 条件指令数)，只含有条件的块
+        self._taint_source_bbs = set()  # 🔧 新增：含污点源操作码的基本块起始偏移
+        self._param_taint_cache = {}  # 🔧 新增：(基本块, 敏感操作偏移, 槽位) → 块内参数来源判断结果（None表示块内无法确定）
+        self._sload_bbs_by_slot = None  # 🔧 新增：槽位 → 含该槽位SLOAD的基本块集合（按需建立）
     
     def analyze(self) -> bool:
         """执行污点分析（增强版：利用改进的CFG）"""
@@ -28,14 +77,12 @@ class TaintAnalyzer:
         cfg = self.bytecode_analyzer.cfg
         var_storage_map = self.bytecode_analyzer.var_storage_map
         
+        # 🔧 改进：建立基本块索引，并在同一次指令扫描中识别污点源、
+        # 预计算每个基本块的条件特征位（路径检查只需按位或）和SSTORE槽位
+        self._build_block_index(bb)
+        
         # 1. 找到污点源（扩展污点源类型）
-        taint_sources = set()
-        for b in bb:
-            for instr in b['instructions']:
-                if instr['op'] in ('CALLDATALOAD', 'CALLDATACOPY', 'CALLER', 'ORIGIN', 
-                                   'CALLVALUE', 'GASPRICE', 'COINBASE', 'TIMESTAMP', 
-                                   'NUMBER', 'DIFFICULTY', 'GASLIMIT'):
-                    taint_sources.add(b['start'])
+        taint_sources = self._taint_source_bbs
         
         print(f"✓ 识别到 {len(taint_sources)} 个污点源基本块")
         
@@ -43,72 +90,142 @@ class TaintAnalyzer:
         total_edges = sum(len(edges) for edges in cfg.values())
         print(f"✓ CFG边数: {total_edges} 条（改进的双分支处理）")
         
+        # 🔧 新增：一次性构建反向CFG，并计算污点源的前向可达集（所有变量共享）
+        rcfg = self._build_reverse_cfg(cfg)
+        # 🔧 新增：基本块很多且安装了numba时，可达性计算使用JIT内核（CSR数组）
+        csr_graph = build_csr_graph(cfg, self._bb_by_start, len(bb))
+        if csr_graph is not None:
+            forward_reachable = csr_graph.reachable(taint_sources)
+        else:
+            forward_reachable = self._reachable_from(taint_sources, cfg)
+        
+        # 🔧 新增：一次性求出处于环上的基本块（强连通分量），所有变量共享
+        # 不在环上的块在任何路径中最多出现一次，BFS时无需统计其出现次数
+        cyclic_blocks = self._find_cyclic_nodes(cfg)
+        
+        # 🔧 新增：一次扫描所有SSTORE，建立 槽位 → 写入该槽位的基本块 索引
+        slot_to_sink_bbs = self._build_slot_sink_index()
+        
         # 2. 为每个变量追踪污点
+        # 🔧 改进：每个变量的结果计算完成后立即写入JSONL（不再在最后统一保存一遍）
         results = []
-        for var, info in var_storage_map.items():
-            slot = info.get('slot')
-            
-            # 找到操作该slot的SSTORE（只检查写入操作，不检查读取）
-            # 🔧 修复：SLOAD只是读取，不会修改变量，不应作为污点汇
-            sink_bbs = set()
-            for b in bb:
-                for idx, instr in enumerate(b['instructions']):
-                    if instr['op'] == 'SSTORE':  # 只检查写入操作
-                        if self._find_slot_in_stack(b['instructions'], idx, slot):
-                            sink_bbs.add(b['start'])
-            
-            # 🔧 改进：污点传播（BFS，支持更复杂的CFG）
-            all_paths = []
-            queue = [(src, [src]) for src in taint_sources]
-            visited = set()
-            
-            # 🔧 新增：限制路径长度防止过度搜索
-            MAX_PATH_LENGTH = 50
-            
-            while queue:
-                curr, path = queue.pop(0)
+        slot_results = {}  # 槽位 → 该槽位的分析结果
+        taint_results_file = os.path.join(self.output_dir, "intermediate", "taint_analysis.jsonl")
+        with JsonlWriter(taint_results_file) as taint_writer:
+            for var, info in var_storage_map.items():
+                slot = info.get('slot')
                 
-                # 🔧 新增：路径长度限制
-                if len(path) > MAX_PATH_LENGTH:
-                    continue
+                # 🔧 新增：路径枚举、条件检测与可达性汇总只取决于槽位，
+                # 共享同一槽位的变量（打包变量、未找到槽位的变量）复用同一份结果
+                cached = slot_results.get(slot)
+                if cached is None:
+                    # 找到操作该slot的SSTORE（只检查写入操作，不检查读取）
+                    # 🔧 修复：SLOAD只是读取，不会修改变量，不应作为污点汇
+                    # 🔧 改进：直接查预先建立的槽位索引
+                    sink_bbs = set(slot_to_sink_bbs.get(slot, ()))
+                    
+                    # 🔧 新增：从（可达的）污点汇反向BFS，得到能到达污点汇的基本块集合
+                    # 无法到达任何污点汇的基本块不可能出现在路径上，BFS时直接剪枝；
+                    # 污点汇全部不可达时跳过路径枚举
+                    reachable_sinks = sink_bbs & forward_reachable
+                    if not reachable_sinks:
+                        live = set()
+                    elif csr_graph is not None:
+                        live = csr_graph.reachable(reachable_sinks, reverse=True)
+                    else:
+                        live = self._reachable_from(reachable_sinks, rcfg)
+                    
+                    # 🔧 改进：污点传播（BFS，支持更复杂的CFG）
+                    # 🔧 改进：队列中保存父指针链 (块, 路径长度, 父链, 最近的环上祖先)，
+                    # 不再逐边复制路径列表，只在到达污点汇时还原完整路径
+                    all_paths = []
+                    paths_truncated = False  # 🔧 新增：是否因达到 max_paths 而提前结束枚举
+                    queue = deque((src, 1, None, None) for src in taint_sources if src in live)
+                    
+                    # 🔧 新增：max_paths=0 为纯可达性模式，不枚举具体路径
+                    if self.max_paths == 0 and queue:
+                        queue.clear()
+                        paths_truncated = True
+                    visited = set()
+                    
+                    # 🔧 新增：限制路径长度防止过度搜索
+                    MAX_PATH_LENGTH = 50
+                    
+                    # 🔧 新增：有CSR图时在JIT内核中完成同样的BFS
+                    if csr_graph is not None and queue:
+                        all_paths, paths_truncated = csr_graph.enumerate_paths(
+                            [link[0] for link in queue], sink_bbs, live, cyclic_blocks,
+                            MAX_PATH_LENGTH, self.max_paths)
+                        queue.clear()
+                    
+                    while queue:
+                        link = queue.popleft()
+                        curr, length, _, cyclic_prev = link
+                    
+                        # 🔧 新增：路径长度限制
+                        if length > MAX_PATH_LENGTH:
+                            continue
+                    
+                        if curr in sink_bbs:
+                            all_paths.append(self._path_from_link(link))
+                            # 🔧 新增：达到路径数上限后立即停止枚举
+                            if self.max_paths is not None and len(all_paths) >= self.max_paths:
+                                paths_truncated = bool(queue)
+                                break
+                            continue
+                    
+                        # 子节点的“最近的环上祖先”：当前块在环上则为当前链，否则沿用当前链的
+                        succ_cyclic_prev = link if curr in cyclic_blocks else cyclic_prev
+                        for succ in cfg.get(curr, []):
+                            # 🔧 改进：防止简单循环（允许有限次重访）
+                            if succ in live and (curr, succ) not in visited:
+                                # 🔧 新增：检测路径中的循环
+                                if succ not in cyclic_blocks or self._count_in_link(link, succ) < 2:  # 允许访问同一个块最多2次
+                                    queue.append((succ, length + 1, link, succ_cyclic_prev))
+                                    visited.add((curr, succ))
+                    
+                    # 汇总
+                    if paths_truncated:
+                        # 🔧 新增：路径未枚举完时，用可达性求污点基本块（既能从污点源到达、又能到达污点汇）
+                        taint_bb_set = live & forward_reachable
+                    else:
+                        taint_bb_set = set()
+                        for p in all_paths:
+                            taint_bb_set.update(p)
+                    
+                    # 3. 🔧 改进：检测路径上的条件判断（更精确的检测）
+                    paths_with_conditions = []
+                    for path in all_paths:
+                        condition_info = self._check_path_has_condition_enhanced(path, bb)
+                        paths_with_conditions.append({
+                            'path': path,
+                            'has_condition': condition_info['has_condition'],
+                            'condition_types': condition_info['condition_types'],  # 🔧 新增：条件类型
+                            'condition_count': condition_info['condition_count']   # 🔧 新增：条件数量
+                        })
+                    
+                    # 🔧 新增：可达性汇总——是否存在一条完全不经过条件块的源→汇路径
+                    # 只需一次受限BFS，不依赖路径枚举（路径枚举受长度和边访问限制）
+                    has_unconditioned_path = bool(reachable_sinks) and self._has_unconditioned_path(
+                        taint_sources, reachable_sinks, cfg, live, csr_graph)
+                    cached = slot_results[slot] = (
+                        all_paths, taint_bb_set, paths_with_conditions,
+                        has_unconditioned_path, paths_truncated)
+                all_paths, taint_bb_set, paths_with_conditions, has_unconditioned_path, paths_truncated = cached
                 
-                if curr in sink_bbs:
-                    all_paths.append(path)
-                    continue
                 
-                for succ in cfg.get(curr, []):
-                    # 🔧 改进：防止简单循环（允许有限次重访）
-                    if (curr, succ) not in visited:
-                        # 🔧 新增：检测路径中的循环
-                        if path.count(succ) < 2:  # 允许访问同一个块最多2次
-                            queue.append((succ, path + [succ]))
-                            visited.add((curr, succ))
-            
-            # 汇总
-            taint_bb_set = set()
-            for p in all_paths:
-                taint_bb_set.update(p)
-            
-            # 3. 🔧 改进：检测路径上的条件判断（更精确的检测）
-            paths_with_conditions = []
-            for path in all_paths:
-                condition_info = self._check_path_has_condition_enhanced(path, bb)
-                paths_with_conditions.append({
-                    'path': path,
-                    'has_condition': condition_info['has_condition'],
-                    'condition_types': condition_info['condition_types'],  # 🔧 新增：条件类型
-                    'condition_count': condition_info['condition_count']   # 🔧 新增：条件数量
-                })
-            
-            result = {
-                "name": var,
-                "offset": slot,
-                "taint_bb": sorted(list(taint_bb_set)),
-                "taint_cfg": all_paths,
-                "paths_with_conditions": paths_with_conditions  # 增强的条件信息
-            }
-            results.append(result)
-        
+                result = {
+                    "name": var,
+                    "offset": slot,
+                    "taint_bb": sorted(list(taint_bb_set)),
+                    "taint_cfg": list(all_paths),
+                    "paths_with_conditions": list(paths_with_conditions),  # 增强的条件信息
+                    "has_unconditioned_path": has_unconditioned_path,  # 🔧 新增：无条件保护的可达路径
+                    "paths_truncated": paths_truncated  # 🔧 新增：路径列表是否因上限被截断
+                }
+                results.append(result)
+                taint_writer.write(result)
+                
         self.taint_results = results
         
         # 统计
@@ -124,14 +241,21 @@ class TaintAnalyzer:
                 total_paths = len(r['paths_with_conditions'])
                 print(f"    • {r['name']}: {total_paths} 条路径, {paths_with_cond} 条有条件保护")
         
-        # 保存结果
-        self._save_taint_results()
+        print(f"  → 污点分析结果: {taint_results_file}")
         
         # 🔧 新增：检测污点是否到达敏感操作
         self._check_taint_to_sensitive_flows()
         
         return True
     
+    def _build_slot_sink_index(self) -> Dict[int, Set[int]]:
+        """🔧 新增：槽位 → 写入该槽位的基本块起始偏移集合（由每块的SSTORE槽位集合反转得到）"""
+        slot_to_sink_bbs = {}
+        for bb_start, slots in self._sstore_slots_by_bb.items():
+            for slot in slots:
+                slot_to_sink_bbs.setdefault(slot, set()).add(bb_start)
+        return slot_to_sink_bbs
+    
     def _find_slot_in_stack(self, instructions, idx, target_slot):
         """
         查找栈中的slot（增强版：支持 mapping 和动态数组）
@@ -149,6 +273,31 @@ class TaintAnalyzer:
             True: 找到目标槽位的访问
             False: 未找到
         """
+        return target_slot in self._stack_slot_candidates(instructions, idx)
+    
+    def _stack_slot_candidates(self, instructions, idx) -> FrozenSet[int]:
+        """
+        🔧 新增：SLOAD/SSTORE 可能访问的所有槽位（_find_slot_in_stack 的两种模式）
+        
+        每个指令列表（基本块）中每条指令的结果只回溯计算一次并缓存，
+        同一条SLOAD/SSTORE被多个变量、多条路径查询时直接复用。
+        
+        Returns:
+            回溯窗口内所有候选 PUSH 值的集合
+        """
+        entry = self._slot_candidate_cache.get(id(instructions))
+        if entry is None or entry[0] is not instructions:
+            entry = (instructions, {})  # 同时持有列表引用，保证 id 不被复用
+            self._slot_candidate_cache[id(instructions)] = entry
+        candidates = entry[1].get(idx)
+        if candidates is None:
+            candidates = entry[1][idx] = frozenset(self._scan_slot_candidates(instructions, idx))
+        return candidates
+    
+    def _scan_slot_candidates(self, instructions, idx) -> Set[int]:
+        """从 SLOAD/SSTORE 向前回溯，收集候选槽位"""
+        candidates = set()
+        
         # 🔧 改进1：检查直接访问（原有逻辑）
         for back in range(1, 6):
             i = idx - back
@@ -156,12 +305,9 @@ class TaintAnalyzer:
                 break
             instr = instructions[i]
             if instr['op'].startswith('PUSH'):
-                try:
-                    pushed = int(instr.get('push_data', '0'), 16)
-                    if pushed == target_slot:
-                        return True  # 直接访问
-                except:
-                    continue
+                value = push_value(instr)
+                if value is not None:
+                    candidates.add(value)  # 直接访问
             elif instr['op'].startswith(('DUP', 'SWAP')):
                 continue
             else:
@@ -195,14 +341,11 @@ class TaintAnalyzer:
                 instr = instructions[i]
                 
                 if instr['op'].startswith('PUSH'):
-                    try:
-                        pushed = int(instr.get('push_data', '0'), 16)
-                        if pushed == target_slot:
-                            return True  # mapping/动态数组访问
-                    except:
-                        continue
+                    value = push_value(instr)
+                    if value is not None:
+                        candidates.add(value)  # mapping/动态数组访问
         
-        return False
+        return candidates
     
     def _check_path_has_condition(self, path: List[int], basic_blocks: List[Dict]) -> bool:
         """
@@ -216,24 +359,14 @@ class TaintAnalyzer:
         
         返回: True表示路径上有条件判断（可能是安全的），False表示无条件判断（危险）
         """
-        condition_opcodes = {
-            'JUMPI',      # 条件跳转（if/require的核心）
-            'EQ', 'LT', 'GT', 'SLT', 'SGT',  # 比较操作
-            'ISZERO',     # 零值检查
-            'REVERT'      # 回滚（require失败）
-        }
+        # 遍历路径上的所有基本块（使用预计算的条件特征位）
+        if self._bb_index_source is not basic_blocks:
+            self._build_block_index(basic_blocks)
         
-        # 遍历路径上的所有基本块
         for bb_start in path:
-            # 找到对应的基本块
-            block = next((b for b in basic_blocks if b['start'] == bb_start), None)
-            if not block:
-                continue
-            
-            # 检查基本块中的指令
-            for instr in block['instructions']:
-                if instr['op'] in condition_opcodes:
-                    return True
+            info = self._bb_cond_info.get(bb_start)
+            if info is not None and info[0] & COND_ANY:
+                return True
         
         return False
     
@@ -253,61 +386,250 @@ class TaintAnalyzer:
             'condition_count': int          # 条件数量
         }
         """
-        condition_types = []
-        condition_count = 0
+        if self._bb_index_source is not basic_blocks:
+            self._build_block_index(basic_blocks)
         
-        # 定义不同类型的条件指令
-        jump_opcodes = {'JUMPI'}
-        compare_opcodes = {'EQ', 'LT', 'GT', 'SLT', 'SGT', 'ISZERO'}
-        revert_opcodes = {'REVERT'}
-        caller_opcodes = {'CALLER', 'ORIGIN'}
+        # 🔧 新增：相同路径（如多个流共享的“污点汇→敏感操作”子路径）只计算一次
+        cache_key = tuple(path)
+        cached = self._path_cond_cache.get(cache_key)
+        if cached is None:
+            cached = self._path_cond_cache[cache_key] = self._compute_path_conditions(path)
+        condition_types, condition_count = cached
         
-        # 遍历路径上的所有基本块
-        has_caller = False
-        has_compare = False
+        return {
+            'has_condition': len(condition_types) > 0,
+            'condition_types': list(condition_types),
+            'condition_count': condition_count
+        }
+    
+    def _compute_path_conditions(self, path: List[int]):
+        """🔧 新增：计算路径的 (条件类型元组, 条件数量)"""
+        condition_types = []
+        condition_count = 0
+        mask = 0
         
+        # 遍历路径上的所有基本块：按位或合并预计算的条件特征位
         for bb_start in path:
-            block = next((b for b in basic_blocks if b['start'] == bb_start), None)
-            if not block:
+            info = self._bb_cond_info.get(bb_start)
+            if info is None:
                 continue
             
-            # 检查基本块中的指令
-            for instr in block['instructions']:
-                op = instr['op']
-                
-                # 检测条件跳转
-                if op in jump_opcodes:
-                    if 'conditional_jump' not in condition_types:
-                        condition_types.append('conditional_jump')
-                    condition_count += 1
-                
-                # 检测比较操作
-                if op in compare_opcodes:
-                    has_compare = True
-                    if 'comparison' not in condition_types:
-                        condition_types.append('comparison')
-                    condition_count += 1
-                
-                # 检测回滚保护
-                if op in revert_opcodes:
-                    if 'revert' not in condition_types:
-                        condition_types.append('revert')
-                    condition_count += 1
-                
-                # 检测调用者检查
-                if op in caller_opcodes:
-                    has_caller = True
+            block_mask, block_order, block_count = info
+            # 条件类型按在路径上首次出现的顺序记录
+            new_bits = block_mask & ~mask & COND_ANY
+            if new_bits:
+                for bit in block_order:
+                    if bit & new_bits:
+                        condition_types.append(_COND_TYPE_NAMES[bit])
+            mask |= block_mask
+            condition_count += block_count
         
         # 🔧 智能判断：CALLER + 比较操作 = 访问控制
-        if has_caller and has_compare:
-            if 'access_control' not in condition_types:
-                condition_types.append('access_control')
+        if mask & COND_CALLER and mask & COND_COMPARE:
+            condition_types.append('access_control')
         
-        return {
-            'has_condition': len(condition_types) > 0,
-            'condition_types': condition_types,
-            'condition_count': condition_count
-        }
+        return tuple(condition_types), condition_count
+    
+    @staticmethod
+    def _path_from_link(link) -> List[int]:
+        """🔧 新增：沿父指针链还原路径（源 → 当前块）"""
+        path = []
+        while link is not None:
+            path.append(link[0])
+            link = link[2]
+        path.reverse()
+        return path
+    
+    @staticmethod
+    def _count_in_link(link, node: int, limit: int = 2) -> int:
+        """
+        🔧 新增：父指针链表示的路径中（环上块）node 出现的次数，达到 limit 即返回
+        
+        只沿“最近的环上祖先”指针跳转：node 在环上时，路径中不在环上的块不可能等于它，
+        因此只需检查当前块和环上的祖先块。
+        """
+        count = 0
+        while link is not None:
+            if link[0] == node:
+                count += 1
+                if count >= limit:
+                    break
+            link = link[3]
+        return count
+    
+    @staticmethod
+    def _find_cyclic_nodes(cfg: Dict[int, List[int]]) -> Set[int]:
+        """
+        🔧 新增：找出处于环上的节点（迭代版Tarjan强连通分量算法）
+        
+        节点数>1的强连通分量中的节点，以及有自环的节点
+        """
+        index = {}
+        lowlink = {}
+        on_stack = set()
+        scc_stack = []
+        cyclic = set()
+        counter = 0
+        
+        for root in cfg:
+            if root in index:
+                continue
+            index[root] = lowlink[root] = counter
+            counter += 1
+            scc_stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(cfg.get(root, ())))]
+            while work:
+                node, succs = work[-1]
+                advanced = False
+                for succ in succs:
+                    if succ not in index:
+                        index[succ] = lowlink[succ] = counter
+                        counter += 1
+                        scc_stack.append(succ)
+                        on_stack.add(succ)
+                        work.append((succ, iter(cfg.get(succ, ()))))
+                        advanced = True
+                        break
+                    if succ in on_stack:
+                        lowlink[node] = min(lowlink[node], index[succ])
+                    if succ == node:
+                        cyclic.add(node)  # 自环
+                if advanced:
+                    continue
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = scc_stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1:
+                        cyclic.update(component)
+        return cyclic
+    
+    @staticmethod
+    def _build_reverse_cfg(cfg: Dict[int, List[int]]) -> Dict[int, List[int]]:
+        """🔧 新增：构建反向CFG（后继 → 前驱列表）"""
+        rcfg = {}
+        for src, succs in cfg.items():
+            for succ in succs:
+                rcfg.setdefault(succ, []).append(src)
+        return rcfg
+    
+    @staticmethod
+    def _reachable_from(starts, graph: Dict[int, List[int]]) -> Set[int]:
+        """🔧 新增：从一组起点出发，沿graph的边可达的所有节点（含起点）"""
+        reached = set(starts)
+        stack = list(reached)
+        while stack:
+            node = stack.pop()
+            for nxt in graph.get(node, ()):
+                if nxt not in reached:
+                    reached.add(nxt)
+                    stack.append(nxt)
+        return reached
+    
+    def _has_unconditioned_path(self, sources, sinks: Set[int],
+                                cfg: Dict[int, List[int]], live: Set[int],
+                                csr_graph=None) -> bool:
+        """
+        🔧 新增：判断是否存在只经过无条件基本块（无JUMPI/比较/回滚）的源→汇路径
+        
+        在能到达污点汇的基本块（live）内做一次BFS，跳过带条件特征位的基本块。
+        """
+        cond_info = self._bb_cond_info
+        
+        def unconditioned(node):
+            info = cond_info.get(node)
+            return node in live and not (info and info[0] & COND_ANY)
+        
+        if csr_graph is not None:
+            allowed = {node for node in live if unconditioned(node)}
+            return not sinks.isdisjoint(csr_graph.reachable(sources, allowed=allowed))
+        
+        reached = {src for src in sources if unconditioned(src)}
+        queue = deque(reached)
+        while queue:
+            curr = queue.popleft()
+            if curr in sinks:
+                return True
+            for succ in cfg.get(curr, ()):
+                if succ not in reached and unconditioned(succ):
+                    reached.add(succ)
+                    queue.append(succ)
+        return False
+    
+    def _build_block_index(self, basic_blocks: List[Dict]):
+        """🔧 新增：建立基本块索引（起始偏移 → 基本块），并单次扫描预计算污点源、条件特征位和SSTORE槽位"""
+        # 起始偏移重复时以第一个基本块为准（与 _scan_blocks 的条件特征一致）
+        self._bb_by_start = {}
+        for b in basic_blocks:
+            self._bb_by_start.setdefault(b['start'], b)
+        self._bb_index_source = basic_blocks
+        self._path_cond_cache = {}
+        self._slot_candidate_cache = {}
+        self._param_taint_cache = {}
+        self._sload_bbs_by_slot = None
+        self._scan_blocks(basic_blocks)
+    
+    def _get_block(self, bb_start: int, basic_blocks: List[Dict]) -> Optional[Dict]:
+        """🔧 新增：按起始偏移O(1)查找基本块（替代对基本块列表的线性扫描）"""
+        if self._bb_index_source is not basic_blocks:
+            self._build_block_index(basic_blocks)
+        return self._bb_by_start.get(bb_start)
+    
+    def _scan_blocks(self, basic_blocks: List[Dict]):
+        """
+        🔧 改进：单次遍历所有基本块的指令，同时完成三项逐块分析
+        （原先是三次独立遍历：污点源识别、条件特征预计算、SSTORE槽位索引）
+        
+        每个基本块记录：
+        - 是否包含污点源操作码（TAINT_SOURCE_OPS）
+        - 条件特征位（COND_JUMPI | COND_COMPARE | COND_REVERT | COND_CALLER）、
+          各条件特征位在块内首次出现的顺序（保证路径上条件类型的输出顺序）、
+          条件指令数（JUMPI、比较、回滚指令的条数）；
+          稀疏存储，只记录含条件特征的基本块，起始偏移重复时以第一个基本块为准
+        - SSTORE写入的槽位集合（与逐条调用 _find_slot_in_stack 的结果一致，但每条SSTORE只回溯一次）
+        """
+        self._taint_source_bbs = set()
+        self._bb_cond_info = {}
+        self._sstore_slots_by_bb = {}
+        seen = set()
+        for block in basic_blocks:
+            start = block['start']
+            first = start not in seen
+            seen.add(start)
+            instructions = block['instructions']
+            is_source = False
+            mask = 0
+            order = []
+            count = 0
+            for idx, instr in enumerate(instructions):
+                op = instr['op']
+                if op == 'SSTORE':  # 只检查写入操作
+                    self._sstore_slots_by_bb.setdefault(start, set()).update(
+                        self._stack_slot_candidates(instructions, idx))
+                    continue
+                if op in TAINT_SOURCE_OPS:
+                    is_source = True
+                bit = _OPCODE_COND_BITS.get(op)
+                if bit is None or not first:
+                    continue
+                if bit != COND_CALLER:
+                    count += 1
+                if not mask & bit:
+                    mask |= bit
+                    order.append(bit)
+            if is_source:
+                self._taint_source_bbs.add(start)
+            if mask:
+                self._bb_cond_info[start] = (mask, tuple(order), count)
     
     def _check_taint_to_sensitive_flows(self):
         """
@@ -355,16 +677,23 @@ class TaintAnalyzer:
             if not taint_paths:
                 continue
             
+            # 🔧 新增：污点基本块（包含所有路径上的块）与敏感操作块不相交时，任何路径都不可能到达敏感操作
+            if sensitive_blocks.keys().isdisjoint(taint_result['taint_bb']):
+                continue
+            
             # 检查每条污点路径
             for path in taint_paths:
                 # 查找路径中是否包含敏感操作所在的基本块
                 sensitive_blocks_in_path = []
+                path_index = None
                 for bb in path:
                     if bb in sensitive_blocks:
+                        if path_index is None:
+                            path_index = self._first_index_map(path)
                         # 🔧 关键改进：检查敏感操作的参数是否受污点影响
                         for op in sensitive_blocks[bb]:
                             param_tainted = self._check_sensitive_op_param_tainted(
-                                bb, op, var_slot, basic_blocks, path
+                                bb, op, var_slot, basic_blocks, path, path_index
                             )
                             
                             sensitive_blocks_in_path.append({
@@ -499,26 +828,23 @@ class TaintAnalyzer:
         Returns:
             污点汇在路径中的索引，未找到返回 -1
         """
-        last_sstore_idx = -1
+        if self._bb_index_source is not basic_blocks:
+            self._build_block_index(basic_blocks)
         
-        for idx, bb_start in enumerate(path):
-            # 找到对应的基本块
-            block = next((b for b in basic_blocks if b['start'] == bb_start), None)
-            if not block:
-                continue
-            
+        # 🔧 改进：直接查预先建立的每块SSTORE槽位集合，从路径末尾向前找第一个命中的块
+        sstore_slots_by_bb = self._sstore_slots_by_bb
+        for idx in range(len(path) - 1, -1, -1):
             # 检查基本块中是否有 SSTORE var_slot
-            for instr_idx, instr in enumerate(block['instructions']):
-                if instr['op'] == 'SSTORE':
-                    # 检查是否是我们追踪的变量
-                    if self._find_slot_in_stack(block['instructions'], instr_idx, var_slot):
-                        last_sstore_idx = idx  # 记录位置
+            slots = sstore_slots_by_bb.get(path[idx])
+            if slots and var_slot in slots:
+                return idx  # 记录位置
         
-        return last_sstore_idx
+        return -1
     
     def _check_sensitive_op_param_tainted(self, bb_start: int, sensitive_op: Dict, 
                                           var_slot: int, basic_blocks: List[Dict],
-                                          taint_path: List[int]) -> Dict:
+                                          taint_path: List[int],
+                                          path_index: Optional[Dict[int, int]] = None) -> Dict:
         """
         🔧 新增：检查敏感操作的参数是否受污点影响
         
@@ -533,6 +859,7 @@ class TaintAnalyzer:
             var_slot: 污点变量的存储槽位
             basic_blocks: 所有基本块
             taint_path: 污点传播路径
+            path_index: 基本块 → 在路径中首次出现的位置（None时现场计算）
         
         Returns:
             {
@@ -542,8 +869,53 @@ class TaintAnalyzer:
                 'param_source': str  # 参数来源
             }
         """
+        if self._bb_index_source is not basic_blocks:
+            self._build_block_index(basic_blocks)
+        
+        # 🔧 改进：基本块内的参数来源判断只取决于 (基本块, 敏感操作, 槽位)，缓存后各路径复用
+        key = (bb_start, sensitive_op.get('offset', -1), var_slot)
+        if key in self._param_taint_cache:
+            in_block = self._param_taint_cache[key]
+        else:
+            in_block = self._param_taint_cache[key] = self._param_taint_in_block(
+                bb_start, sensitive_op, var_slot, basic_blocks)
+        if in_block is not None:
+            return dict(in_block)
+        
+        # 🔧 检测4：检查路径上是否有 SLOAD 操作
+        # 即使在当前基本块没找到，也可能在前面的基本块中加载了
+        if path_index is None:
+            path_index = self._first_index_map(taint_path)
+        path_idx = path_index.get(bb_start, -1)
+        if path_idx > 0:
+            # 🔧 改进：查预先建立的 槽位 → 含该槽位SLOAD的基本块 索引，不再逐块回溯指令
+            sload_bbs = self._sload_bbs_for_slot(var_slot)
+            if sload_bbs and any(prev_bb_start in sload_bbs for prev_bb_start in taint_path[:path_idx]):
+                return {
+                    'is_tainted': True,
+                    'confidence': 'medium',
+                    'reason': f'路径上存在 SLOAD slot_{var_slot}（可能影响参数）',
+                    'param_source': 'storage_read_in_path'
+                }
+        
+        # 默认：无法确定污点影响（保守策略：标记为可能受影响）
+        return {
+            'is_tainted': True,
+            'confidence': 'low',
+            'reason': '无法确定参数来源，污点路径经过此处（保守判断）',
+            'param_source': 'uncertain'
+        }
+    
+    def _param_taint_in_block(self, bb_start: int, sensitive_op: Dict, var_slot: int,
+                              basic_blocks: List[Dict]) -> Optional[Dict]:
+        """
+        🔧 新增：在敏感操作所在基本块内回溯指令判断参数来源
+        
+        Returns:
+            能在块内确定时返回检测结果，否则返回None（继续检查路径上的SLOAD）
+        """
         # 找到包含敏感操作的基本块
-        block = next((b for b in basic_blocks if b['start'] == bb_start), None)
+        block = self._get_block(bb_start, basic_blocks)
         if not block:
             return {'is_tainted': False, 'confidence': 'low', 'reason': '未找到基本块', 'param_source': 'unknown'}
         
@@ -586,7 +958,7 @@ class TaintAnalyzer:
                     }
             
             # 🔧 检测2：来自其他污点源
-            if op in ('CALLER', 'ORIGIN', 'CALLDATALOAD', 'CALLDATACOPY', 'CALLVALUE'):
+            if op in PARAM_TAINT_SOURCE_OPS:
                 return {
                     'is_tainted': True,
                     'confidence': 'high',
@@ -604,33 +976,28 @@ class TaintAnalyzer:
                     # 继续检查，但降低置信度
                     pass
         
-        # 🔧 检测4：检查路径上是否有 SLOAD 操作
-        # 即使在当前基本块没找到，也可能在前面的基本块中加载了
-        path_idx = taint_path.index(bb_start) if bb_start in taint_path else -1
-        if path_idx > 0:
-            # 检查路径中前面的基本块
-            for prev_bb_start in taint_path[:path_idx]:
-                prev_block = next((b for b in basic_blocks if b['start'] == prev_bb_start), None)
-                if prev_block:
-                    for instr in prev_block['instructions']:
-                        if instr.get('op') == 'SLOAD':
-                            if self._find_slot_in_stack(prev_block['instructions'], 
-                                                       prev_block['instructions'].index(instr), 
-                                                       var_slot):
-                                return {
-                                    'is_tainted': True,
-                                    'confidence': 'medium',
-                                    'reason': f'路径上存在 SLOAD slot_{var_slot}（可能影响参数）',
-                                    'param_source': 'storage_read_in_path'
-                                }
-        
-        # 默认：无法确定污点影响（保守策略：标记为可能受影响）
-        return {
-            'is_tainted': True,
-            'confidence': 'low',
-            'reason': '无法确定参数来源，污点路径经过此处（保守判断）',
-            'param_source': 'uncertain'
-        }
+        return None
+    
+    def _sload_bbs_for_slot(self, var_slot: int) -> Set[int]:
+        """🔧 新增：含读取 var_slot 的SLOAD的基本块集合（首次使用时一次扫描所有SLOAD建立索引）"""
+        if self._sload_bbs_by_slot is None:
+            index = {}
+            for bb_start, block in self._bb_by_start.items():
+                instructions = block['instructions']
+                for idx, instr in enumerate(instructions):
+                    if instr.get('op') == 'SLOAD':
+                        for slot in self._stack_slot_candidates(instructions, idx):
+                            index.setdefault(slot, set()).add(bb_start)
+            self._sload_bbs_by_slot = index
+        return self._sload_bbs_by_slot.get(var_slot)
+    
+    @staticmethod
+    def _first_index_map(path: List[int]) -> Dict[int, int]:
+        """基本块 → 在路径中首次出现的位置（与 list.index 语义一致）"""
+        index = {}
+        for i, bb in enumerate(path):
+            index.setdefault(bb, i)
+        return index
     
     def _save_taint_to_sensitive_flows(self):
         """保存污点到敏感函数的流分析结果"""
@@ -639,21 +1006,10 @@ class TaintAnalyzer:
         
         output_file = os.path.join(self.output_dir, "intermediate", "taint_to_sensitive_flows.json")
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump({
-                'flow_count': len(self.taint_to_sensitive_flows),
-                'flows': self.taint_to_sensitive_flows
-            }, f, indent=2, ensure_ascii=False)
+        # 🔧 改进：优先使用orjson序列化（带写缓冲）
+        write_json(output_file, {
+            'flow_count': len(self.taint_to_sensitive_flows),
+            'flows': self.taint_to_sensitive_flows
+        })
         
         print(f"  → 污点-敏感函数流分析: {output_file}")
-    
-    def _save_taint_results(self):
-        """保存污点分析结果"""
-        output_file = os.path.join(self.output_dir, "intermediate", "taint_analysis.jsonl")
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            for result in self.taint_results:
-                f.write(json.dumps(result, ensure_ascii=False) + '\n')
-        
-        print(f"  → 污点分析结果: {output_file}")
-
@@ -4,10 +4,42 @@
 源码映射演示 - 使用启发式方法将污点路径映射到源码
 """
 
-import json
+import hashlib
 import re
+import sys
+from bisect import bisect_right
 from TaintAnalyzer import TaintAnalyzer
 from BytecodeAnalyzer import BytecodeAnalyzer
+from utils.json_io import write_json
+
+
+# 声明行关键字（子串匹配，合并为一个正则）
+_DECL_KEYWORD_RE = re.compile(r'uint|address|bool|mapping|string')
+
+# 标识符（与 \b 单词边界的定义一致）
+_IDENT_RE = re.compile(r'\w+')
+
+# 函数声明
+_FUNCTION_DECL_RE = re.compile(r'function\s+(\w+)')
+
+# 源码解析结果缓存：内容SHA-256 → (function_map, 行号→函数数组, 标识符倒排索引, 去空白的行)
+# 同一进程内多次映射同一份源码（批量分析）时跳过重复解析；解析结果只读共享
+_PARSE_CACHE = {}
+_PARSE_CACHE_SIZE = 64
+
+
+def _split_lines(text: str):
+    """
+    按通用换行符（LF、CRLF、CR）切分行，与文本模式 readlines() 的行划分一致
+
+    不使用 str.splitlines()：它还会在垂直制表符、换页符、U+2028 等字符处断行，改变行号。
+    """
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    lines = text.split('\n')
+    if lines[-1] == '':
+        lines.pop()  # 以换行结尾（或空文件）时没有最后的空行
+    return lines
 
 
 class SimpleSourceMapper:
@@ -17,69 +49,156 @@ class SimpleSourceMapper:
         self.source_file = source_file
         self.source_lines = []
         self.function_map = {}
+        self._var_re_cache = {}  # 变量名 → 预编译的使用位置正则
+        self._ident_index = {}  # 标识符 → 出现该标识符（且其后有';'）的行号列表
+        self._line_to_func = []  # 行号 → 所属函数名（下标0不使用）
+        self._stripped_lines = []  # 去除首尾空白的源码行（用作 code 字段）
+        self._text = None  # 完整源码文本（按需生成，用于非标识符变量名的整体扫描）
+        self._line_starts = []  # 各行在完整源码文本中的起始偏移
         self._load_and_parse_source()
     
     def _load_and_parse_source(self):
         """加载并解析源码"""
-        with open(self.source_file, 'r', encoding='utf-8') as f:
-            self.source_lines = f.readlines()
+        # 🔧 改进：二进制读取后整体解码、一次切分成行（行尾不再保留换行符）
+        with open(self.source_file, 'rb') as f:
+            data = f.read()
+        self.source_lines = _split_lines(data.decode('utf-8'))
+        
+        # 🔧 新增：内容相同的源码直接复用缓存的解析结果
+        digest = hashlib.sha256(data).hexdigest()
+        cached = _PARSE_CACHE.get(digest)
+        if cached is not None:
+            self.function_map, self._line_to_func, self._ident_index, self._stripped_lines = cached
+            return
         
         # 解析函数和变量位置
+        # 🔧 改进：解析时直接填写 行号 → 函数名 数组，查询所属函数时不再遍历所有函数的行号列表
+        # 🔧 改进：同一次遍历中建立标识符倒排索引，源码只扫描一遍
+        line_to_func = [None] * (len(self.source_lines) + 1)
+        ident_index = {}
         current_function = None
         for line_num, line in enumerate(self.source_lines, 1):
-            # 检测函数声明
-            func_match = re.search(r'function\s+(\w+)', line)
+            self._index_identifiers(ident_index, line_num, line)
+            
+            # 检测函数声明（不含关键字的行跳过正则匹配）
+            func_match = _FUNCTION_DECL_RE.search(line) if 'function' in line else None
             if func_match:
-                func_name = func_match.group(1)
+                func_name = sys.intern(func_match.group(1))
+                if current_function:
+                    self.function_map[current_function]['end_line'] = line_num - 1
+                if func_name in self.function_map:
+                    # 同名函数（重载）覆盖之前的记录，之前记录的行不再属于任何函数
+                    line_to_func = [None if f == func_name else f for f in line_to_func]
                 current_function = func_name
+                # 🔧 改进：只记录起止行，不再为每个函数保存行号列表（所属函数查 line_to_func）
                 self.function_map[func_name] = {
                     'start_line': line_num,
-                    'lines': [],
+                    'end_line': line_num,
                     'variables_used': []
                 }
             
-            # 记录函数体
+            # 记录函数体（函数延续到下一个函数声明为止）
             if current_function:
-                self.function_map[current_function]['lines'].append(line_num)
-                
-                # 检测函数结束
-                if line.strip() == '}' and len([c for c in line if c == '}']) == 1:
-                    # 简单判断：单独的}可能是函数结束
-                    pass
+                line_to_func[line_num] = current_function
+        if current_function:
+            self.function_map[current_function]['end_line'] = len(self.source_lines)
+        
+        self._line_to_func = line_to_func
+        self._ident_index = ident_index
+        self._stripped_lines = [line.strip() for line in self.source_lines]
+        
+        if len(_PARSE_CACHE) >= _PARSE_CACHE_SIZE:
+            del _PARSE_CACHE[next(iter(_PARSE_CACHE))]  # 淘汰最早缓存的条目
+        _PARSE_CACHE[digest] = (self.function_map, self._line_to_func, self._ident_index,
+                                self._stripped_lines)
+    
+    @staticmethod
+    def _index_identifiers(index: dict, line_num: int, line: str):
+        """
+        把一行中的标识符加入倒排索引：标识符 → 行号列表
+        
+        只记录其后同一行还有';'的出现位置（与 \\bvar\\b.*?; 的匹配条件一致），
+        查询变量时不再逐行扫描整个文件。
+        """
+        last_semi = line.rfind(';')
+        if last_semi < 0:
+            return
+        for m in _IDENT_RE.finditer(line, 0, last_semi):
+            ident = m.group()
+            lines = index.get(ident)
+            if lines is None:
+                # 🔧 新增：标识符首次出现时驻留（sys.intern），多个映射器实例共享同一字符串对象
+                lines = index[sys.intern(ident)] = []
+            if not lines or lines[-1] != line_num:
+                lines.append(line_num)
     
     def find_variable_usage(self, var_name: str):
         """查找变量在源码中的使用位置"""
         usages = []
         
-        for line_num, line in enumerate(self.source_lines, 1):
-            # 查找变量声明
-            if re.search(rf'\b{var_name}\b.*?;', line):
-                usage_type = 'declaration' if any(kw in line for kw in 
-                    ['uint', 'address', 'bool', 'mapping', 'string']) else 'usage'
-                
-                # 判断是读还是写
-                if '=' in line and var_name in line.split('=')[0]:
-                    operation = 'write'
-                elif var_name in line:
-                    operation = 'read'
-                else:
-                    operation = 'unknown'
-                
-                usages.append({
-                    'line': line_num,
-                    'code': line.strip(),
-                    'type': usage_type,
-                    'operation': operation,
-                    'function': self._find_function_for_line(line_num)
-                })
+        # 🔧 改进：通过倒排索引只遍历出现该变量的行
+        for line_num in self._candidate_lines(var_name):
+            line = self.source_lines[line_num - 1]
+            usage_type = 'declaration' if _DECL_KEYWORD_RE.search(line) else 'usage'
+            
+            # 判断是读还是写（变量出现在第一个'='之前）
+            eq_pos = line.find('=')
+            if eq_pos >= 0 and line.find(var_name, 0, eq_pos) >= 0:
+                operation = 'write'
+            elif var_name in line:
+                operation = 'read'
+            else:
+                operation = 'unknown'
+            
+            usages.append({
+                'line': line_num,
+                'code': self._stripped_lines[line_num - 1],
+                'type': usage_type,
+                'operation': operation,
+                'function': self._find_function_for_line(line_num)
+            })
         
         return usages
     
+    def _candidate_lines(self, var_name: str):
+        """匹配 \\bvar\\b.*?; 的行号（普通标识符查倒排索引，其他名字回退到整体正则扫描）"""
+        if _IDENT_RE.fullmatch(var_name):
+            return self._ident_index.get(var_name, [])
+        # 🔧 改进：整个源码一次 finditer，再按行起始偏移换算行号（不再逐行调用正则）
+        text = self._source_text()
+        line_starts = self._line_starts
+        result = []
+        for m in self._get_var_re(var_name).finditer(text):
+            line_num = bisect_right(line_starts, m.start())
+            if not result or result[-1] != line_num:
+                result.append(line_num)
+        return result
+    
+    def _source_text(self):
+        """以'\\n'连接的完整源码及各行起始偏移（首次使用时生成）"""
+        if self._text is None:
+            self._text = '\n'.join(self.source_lines)
+            starts = [0] * len(self.source_lines)
+            offset = 0
+            for i, line in enumerate(self.source_lines):
+                starts[i] = offset
+                offset += len(line) + 1
+            self._line_starts = starts
+        return self._text
+    
+    def _get_var_re(self, var_name: str):
+        """获取变量使用位置的正则（按变量名缓存，避免每行重新编译）"""
+        var_re = self._var_re_cache.get(var_name)
+        if var_re is None:
+            # 🔧 改进：用 [^;\n]*; 代替 .*?;，匹配不会越过语句结尾或行尾（行内结果相同）
+            var_re = re.compile(rf'\b{re.escape(var_name)}\b[^;\n]*;')
+            self._var_re_cache[var_name] = var_re
+        return var_re
+    
     def _find_function_for_line(self, line_num: int):
         """找到某行代码所属的函数"""
-        for func_name, func_info in self.function_map.items():
-            if line_num in func_info['lines']:
-                return func_name
+        if 0 < line_num < len(self._line_to_func):
+            return self._line_to_func[line_num]
         return None
     
     def map_taint_to_source(self, taint_result: dict, bytecode_analyzer: BytecodeAnalyzer):
@@ -147,16 +266,21 @@ def analyze_and_map_to_source(bytecode_file: str, source_file: str,
     
     mapper = SimpleSourceMapper(source_file)
     mapped_results = []
+    vulnerable_results = []  # 🔧 新增：映射时顺带收集检测到污点的结果，安全建议无需再筛选一遍
     
     for taint_result in taint_results:
         mapped = mapper.map_taint_to_source(taint_result, taint_analyzer.bytecode_analyzer)
         mapped_results.append(mapped)
+        if mapped['has_taint']:
+            vulnerable_results.append(mapped)
     
     print(f"✓ 源码映射完成")
     
     # 步骤3: 生成报告
-    print("\n【步骤3】分析报告")
-    print("=" * 80)
+    # 🔧 改进：报告先收集到列表，最后一次性写到stdout（不再逐行print）
+    report_lines = []
+    report_lines.append("\n【步骤3】分析报告")
+    report_lines.append("=" * 80)
     
     for idx, result in enumerate(mapped_results, 1):
         var_name = result['variable']
@@ -165,42 +289,44 @@ def analyze_and_map_to_source(bytecode_file: str, source_file: str,
         status_icon = "⚠️" if has_taint else "✅"
         status_text = "检测到污点" if has_taint else "未检测到污点"
         
-        print(f"\n[{idx}] 变量: {var_name}")
-        print(f"    状态: {status_icon} {status_text}")
-        print(f"    存储槽位: {result['storage_slot']}")
+        report_lines.append(f"\n[{idx}] 变量: {var_name}")
+        report_lines.append(f"    状态: {status_icon} {status_text}")
+        report_lines.append(f"    存储槽位: {result['storage_slot']}")
         
         if has_taint:
-            print(f"    污点路径数: {result['taint_paths_count']}")
-            print(f"    受影响的基本块: {result['affected_basic_blocks']}")
+            report_lines.append(f"    污点路径数: {result['taint_paths_count']}")
+            report_lines.append(f"    受影响的基本块: {result['affected_basic_blocks']}")
         
         # 显示源码使用情况
         if result['source_usages']:
-            print(f"\n    📄 源码中的使用位置:")
+            report_lines.append(f"\n    📄 源码中的使用位置:")
             for usage in result['source_usages']:
                 op_icon = "✏️" if usage['operation'] == 'write' else "👁️"
                 func_info = f" (在函数 {usage['function']})" if usage['function'] else ""
-                print(f"       {op_icon} 行 {usage['line']:3d}: {usage['code']}{func_info}")
+                report_lines.append(f"       {op_icon} 行 {usage['line']:3d}: {usage['code']}{func_info}")
         
         # 显示风险位置
         if result['risk_locations']:
-            print(f"\n    ⚠️  风险位置（可能受污点影响的写操作）:")
+            report_lines.append(f"\n    ⚠️  风险位置（可能受污点影响的写操作）:")
             for risk in result['risk_locations']:
                 func_name = risk['function'] or '未知函数'
-                print(f"       ⛔ 行 {risk['line']:3d} ({func_name}): {risk['code']}")
+                report_lines.append(f"       ⛔ 行 {risk['line']:3d} ({func_name}): {risk['code']}")
                 
                 # 读取前后几行代码提供上下文
                 line_idx = risk['line'] - 1
                 if line_idx > 0:
                     context_before = mapper.source_lines[line_idx - 1].strip()
-                    print(f"          上文: {context_before}")
+                    report_lines.append(f"          上文: {context_before}")
                 if line_idx < len(mapper.source_lines) - 1:
                     context_after = mapper.source_lines[line_idx + 1].strip()
-                    print(f"          下文: {context_after}")
+                    report_lines.append(f"          下文: {context_after}")
     
-    print("\n" + "=" * 80)
+    report_lines.append("\n" + "=" * 80)
+    sys.stdout.write("\n".join(report_lines) + "\n")
+    sys.stdout.flush()
     
     # 安全建议
-    _print_security_advice(mapped_results)
+    _print_security_advice(vulnerable_results)
     
     # 保存结果
     if output_file:
@@ -214,18 +340,15 @@ def analyze_and_map_to_source(bytecode_file: str, source_file: str,
             'results': mapped_results
         }
         
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(report, f, ensure_ascii=False, indent=2)
+        write_json(output_file, report)
         
         print(f"\n💾 详细报告已保存到: {output_file}")
     
     return mapped_results
 
 
-def _print_security_advice(results: list):
-    """打印安全建议"""
-    vulnerable = [r for r in results if r['has_taint']]
-    
+def _print_security_advice(vulnerable: list):
+    """打印安全建议（vulnerable 为检测到污点的映射结果）"""
     if not vulnerable:
         print("\n✅ 安全评估: 未检测到明显的污点传播风险")
         print("   注意: 仍建议进行全面的安全审计")
@@ -70,7 +70,8 @@ def analyze_contract_bytecode(bytecode_path: str, key_variables: list, output_fi
     # 第二步：污点分析
     print("\n【第2步】污点分析")
     print("-" * 70)
-    taint_analyzer = TaintAnalyzer(bytecode_path, key_variables)
+    # 复用第一步的字节码分析结果（反汇编、CFG、存储映射），不再重新分析
+    taint_analyzer = TaintAnalyzer(bytecode_path, key_variables, bytecode_analyzer=bytecode_analyzer)
     taint_results = taint_analyzer.analyze()
     
     print(f"✓ 污点分析完成，分析了 {len(taint_results)} 个关键变量")
@@ -5,10 +5,13 @@
 """
 
 import os
-import json
 import csv
+import heapq
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from utils import json_io
+
 ROOT_DIR = "analysis_output_pretty_smart"
 SUMMARY_JSON = "analysis_summary_pretty_smart.json"
 SUMMARY_CSV = "analysis_summary_pretty_smart.csv"
@@ -16,68 +19,82 @@ SUMMARY_CSV = "analysis_summary_pretty_smart.csv"
 
 def read_json(path):
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return json_io.read_json(path)
     except Exception as e:
         print(f"⚠️ 无法读取 {path}: {e}")
         return None
 
 
+def _process_folder(root_dir, folder):
+    """
+    读取单个合约目录的 final_report.json 并汇总
+
+    Returns:
+        (汇总结果, None) 或 (None, 失败记录)
+    """
+    report_path = os.path.join(root_dir, folder, "final_report.json")
+    if not os.path.isfile(report_path):
+        # 🔧 新增：记录失败的合约
+        return None, {
+            'filename': folder,
+            'reason': '缺少final_report.json（分析失败或编译失败）'
+        }
+
+    data = read_json(report_path)
+    if not data:
+        return None, {
+            'filename': folder,
+            'reason': 'final_report.json无法解析'
+        }
+
+    summary = data.get("summary", {})
+    result_items = data.get("results", [])
+    filename = os.path.basename(folder)
+    source_file = data.get("source_file", "")
+    analysis_time = data.get("analysis_time")
+
+    total_dangerous_paths = 0
+    total_suspicious_paths = 0
+    vulnerable_vars = []
+
+    # 遍历每个变量的结果
+    for var in result_items:
+        total_dangerous_paths += var.get("dangerous_paths_count", 0)
+        total_suspicious_paths += var.get("suspicious_paths_count", 0)
+
+        if var.get("has_vulnerability"):
+            vulnerable_vars.append(var.get("variable"))
+
+    return {
+        "filename": filename,
+        "source_file": source_file,
+        "analysis_time": analysis_time,
+        "total_variables": summary.get("total_variables", 0),
+        "vulnerable_variables": summary.get("vulnerable_variables", 0),
+        "safe_variables": summary.get("safe_variables", 0),
+        "dangerous_paths_total": total_dangerous_paths,
+        "suspicious_paths_total": total_suspicious_paths,
+        "vuln_variable_names": vulnerable_vars,
+    }, None
+
+
 def collect_results(root_dir=ROOT_DIR):
     results = []
     failed_contracts = []  # 🔧 新增：记录失败的合约
 
-    for folder in os.listdir(root_dir):
-        # 跳过隐藏文件和非目录
-        if folder.startswith('.') or not os.path.isdir(os.path.join(root_dir, folder)):
-            continue
-        
-        report_path = os.path.join(root_dir, folder, "final_report.json")
-        if not os.path.isfile(report_path):
-            # 🔧 新增：记录失败的合约
-            failed_contracts.append({
-                'filename': folder,
-                'reason': '缺少final_report.json（分析失败或编译失败）'
-            })
-            continue
-
-        data = read_json(report_path)
-        if not data:
-            failed_contracts.append({
-                'filename': folder,
-                'reason': 'final_report.json无法解析'
-            })
-            continue
-
-        summary = data.get("summary", {})
-        result_items = data.get("results", [])
-        filename = os.path.basename(folder)
-        source_file = data.get("source_file", "")
-        analysis_time = data.get("analysis_time")
-
-        total_dangerous_paths = 0
-        total_suspicious_paths = 0
-        vulnerable_vars = []
-
-        # 遍历每个变量的结果
-        for var in result_items:
-            total_dangerous_paths += var.get("dangerous_paths_count", 0)
-            total_suspicious_paths += var.get("suspicious_paths_count", 0)
-
-            if var.get("has_vulnerability"):
-                vulnerable_vars.append(var.get("variable"))
-
-        results.append({
-            "filename": filename,
-            "source_file": source_file,
-            "analysis_time": analysis_time,
-            "total_variables": summary.get("total_variables", 0),
-            "vulnerable_variables": summary.get("vulnerable_variables", 0),
-            "safe_variables": summary.get("safe_variables", 0),
-            "dangerous_paths_total": total_dangerous_paths,
-            "suspicious_paths_total": total_suspicious_paths,
-            "vuln_variable_names": vulnerable_vars,
-        })
+    # 跳过隐藏文件和非目录（DirEntry.is_dir 通常无需额外stat）
+    with os.scandir(root_dir) as entries:
+        folders = [entry.name for entry in entries
+                   if not entry.name.startswith('.') and entry.is_dir()]
+
+    # 🔧 新增：各目录的报告读取与解析互不依赖，用线程池并行（结果保持目录顺序）
+    workers = (os.cpu_count() or 1) * 4
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for result, failed in executor.map(lambda folder: _process_folder(root_dir, folder), folders):
+            if result is not None:
+                results.append(result)
+            else:
+                failed_contracts.append(failed)
 
     return results, failed_contracts  # 🔧 新增：返回失败列表
 
@@ -88,8 +105,7 @@ def save_json(results):
         "total_contracts": len(results),
         "contracts": results,
     }
-    with open(SUMMARY_JSON, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    json_io.write_json(SUMMARY_JSON, data)
     print(f"✅ JSON 汇总报告已生成：{SUMMARY_JSON}")
 
 
@@ -104,38 +120,43 @@ def save_csv(results):
         "分析时间",
         "源码文件路径",
     ]
-    with open(SUMMARY_CSV, "w", encoding="utf-8", newline="") as f:
+    # 🔧 改进：较大的写缓冲 + writerows 一次写出所有行
+    with open(SUMMARY_CSV, "w", encoding="utf-8", newline="", buffering=1 << 20) as f:
         writer = csv.writer(f)
         writer.writerow(headers)
-
-        for r in results:
-            vuln_names = ", ".join(r["vuln_variable_names"])
-            writer.writerow([
-                r["filename"],
-                r["total_variables"],
-                r["vulnerable_variables"],
-                r["dangerous_paths_total"],
-                r["suspicious_paths_total"],
-                vuln_names,
-                r["analysis_time"],
-                r["source_file"],
-            ])
+        writer.writerows((
+            r["filename"],
+            r["total_variables"],
+            r["vulnerable_variables"],
+            r["dangerous_paths_total"],
+            r["suspicious_paths_total"],
+            ", ".join(r["vuln_variable_names"]),
+            r["analysis_time"],
+            r["source_file"],
+        ) for r in results)
     print(f"✅ CSV 汇总报告已生成：{SUMMARY_CSV}")
 
 
 def print_top_risks(results, top_n=5):
     """控制台输出前几个最危险的合约"""
-    sorted_items = sorted(
+    # 🔧 改进：只取前 top_n 个，用堆选择代替全量排序（结果与 sorted(..., reverse=True)[:top_n] 相同）
+    top_items = heapq.nlargest(
+        top_n,
         results,
         key=lambda x: (x["dangerous_paths_total"], x["suspicious_paths_total"]),
-        reverse=True,
     )
     print("\n⚠️  最危险的前 %d 个合约：" % top_n)
-    for i, item in enumerate(sorted_items[:top_n], 1):
+    for i, item in enumerate(top_items, 1):
         print(f"{i}. {item['filename']}")
         print(f"   危险路径: {item['dangerous_paths_total']}, 可疑路径: {item['suspicious_paths_total']}, 漏洞变量: {', '.join(item['vuln_variable_names']) or '无'}")
 
 
+def _list_names(path):
+    """目录下的条目名列表（与 os.listdir 相同，基于 os.scandir）"""
+    with os.scandir(path) as entries:
+        return [entry.name for entry in entries]
+
+
 def print_failed_contracts(failed_contracts):
     """🔧 新增：打印编译/分析失败的合约"""
     if not failed_contracts:
@@ -155,14 +176,16 @@ def print_failed_contracts(failed_contracts):
         intermediate_path = os.path.join(folder_path, 'intermediate')
         
         if os.path.exists(intermediate_path):
-            files = os.listdir(intermediate_path) if os.path.isdir(intermediate_path) else []
+            files = _list_names(intermediate_path) if os.path.isdir(intermediate_path) else []
             if files:
                 print(f"   中间文件: {', '.join(files)}")
             else:
                 print(f"   中间文件: 无（编译失败）")
         
         # 检查是否有编译产物
-        has_bin = any(f.endswith('.bin') for f in os.listdir(folder_path) if os.path.isfile(os.path.join(folder_path, f)))
+        # 🔧 改进：os.scandir 的 DirEntry 自带文件类型，先按后缀过滤再判断是否为文件
+        with os.scandir(folder_path) as entries:
+            has_bin = any(entry.name.endswith('.bin') and entry.is_file() for entry in entries)
         if has_bin:
             print(f"   状态: 编译成功，但后续分析失败")
         else:
@@ -5,6 +5,7 @@
 """
 
 from core.analyzer import AllInOneAnalyzer
+from utils import solc_cache
 import sys
 
 def main():
@@ -30,15 +31,23 @@ def main():
     print(f"📂 输出: {output_dir}\n")
     
     try:
+        solc_version = '0.4.23'  # 根据 pragma solidity ^0.4.23
+        # 🔧 新增：按源码内容+版本查找编译缓存，命中时跳过 solc 编译
+        cache_key = solc_cache.cache_key(contract_path, solc_version)
+        precompiled = solc_cache.load(cache_key)
+        
         analyzer = AllInOneAnalyzer(
-            solc_version='0.4.23',  # 根据 pragma solidity ^0.4.23
+            solc_version=solc_version,
             key_variables=key_vars,
             contract_path=contract_path,
             output_dir=output_dir,
+            precompiled_json=precompiled,
         )
         
         print("▶️  开始分析...\n")
         result = analyzer.run()
+        if precompiled is None and analyzer.compiled_artifacts is not None:
+            solc_cache.store(cache_key, analyzer.compiled_artifacts)
         
         if result:
             print("\n✅ 分析成功！")
@@ -4,60 +4,191 @@
 重新分析所有合约 - 使用修复后的代码更新统计数据
 """
 
+import contextlib
+import functools
+import hashlib
+import io
 import json
+import multiprocessing
 import os
+import re
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from core.analyzer import AllInOneAnalyzer
+from utils import json_io, solc_cache
 
 # JSONL 文件路径
 JSONL_PATH = "/Users/almightyfish/Desktop/AChecker/AC/solidity_analysis_deepseek_with_llm_longtail.jsonl"
 OUTPUT_ROOT = "/Users/almightyfish/Desktop/AChecker/analysis_output"
 
 
+# Solidity 版本声明（[^\S\n] 不跨行，与逐行匹配的结果一致）
+PRAGMA_PATTERN = re.compile(r"pragma[^\S\n]+solidity[^\S\n]+(\^?\d+\.\d+\.\d+)", re.IGNORECASE)
+
+# 版本声明通常位于文件开头，先只读取这么多字符
+PRAGMA_HEAD_CHARS = 4096
+
+
+def _iter_brace_spans(raw_text: str):
+    """
+    依次产出 raw_text 中每个 '{' 到其后第一个 '}' 的片段
+
+    与 re.findall(r"\{.*?\}", raw_text, re.DOTALL) 的结果相同，但用 str.find 线性扫描，
+    大量 '{' 之后没有 '}' 时不会反复回溯。
+    """
+    pos = 0
+    while True:
+        start = raw_text.find("{", pos)
+        if start < 0:
+            return
+        end = raw_text.find("}", start)
+        if end < 0:
+            return
+        yield raw_text[start:end + 1]
+        pos = end + 1
+
+
 def extract_critical_vars_from_llm(raw_text: str):
     """从 llm_response_raw 中提取关键变量"""
-    import re
     if not raw_text:
         return []
     
-    critical_vars = []
-    json_pattern = re.compile(r"\{.*?\}", re.DOTALL)
-    matches = json_pattern.findall(raw_text)
+    # 🔧 新增：快速排除不可能含关键变量的文本（is_critical 为 true 时必然出现字面量 true，
+    # 键名不含转义时必然出现 "is_critical"），省去逐段 JSON 解析
+    if 'true' not in raw_text or ('"is_critical"' not in raw_text and '\\' not in raw_text):
+        return []
     
-    for m in matches:
+    critical_vars = []
+    for m in _iter_brace_spans(raw_text):
         try:
-            obj = json.loads(m)
+            obj = json_io.loads(m)
             if obj.get("is_critical") is True and obj.get("variable_name"):
                 critical_vars.append(obj["variable_name"].strip())
         except json.JSONDecodeError:
             continue
     
-    # 去重
-    seen = set()
-    result = []
-    for name in critical_vars:
-        if name not in seen:
-            seen.add(name)
-            result.append(name)
-    return result
+    # 去重（保持顺序）
+    return list(dict.fromkeys(critical_vars))
 
 
+@functools.lru_cache(maxsize=None)
 def extract_solc_version(sol_file: str):
-    """从源码文件中提取 Solidity 版本"""
-    import re
-    pragma_pattern = re.compile(r"pragma\s+solidity\s+(\^?\d+\.\d+\.\d+)", re.IGNORECASE)
-    
+    """从源码文件中提取 Solidity 版本（按路径缓存）"""
     try:
         with open(sol_file, "r", encoding="utf-8") as f:
-            for line in f:
-                match = pragma_pattern.search(line)
-                if match:
-                    version = match.group(1).lstrip("^>=")
-                    return version
+            # 🔧 改进：先在文件开头查找，没找到（或匹配恰好到达截断处）再读取剩余部分
+            text = f.read(PRAGMA_HEAD_CHARS)
+            match = PRAGMA_PATTERN.search(text)
+            if not match or match.end() == len(text):
+                text += f.read()
+                match = PRAGMA_PATTERN.search(text)
+            if match:
+                version = match.group(1).lstrip("^>=")
+                return version
     except Exception as e:
         print(f"⚠️ 无法读取 {sol_file}: {e}")
     return None
 
 
+def _is_file(path: str, dir_files: dict) -> bool:
+    """
+    🔧 新增：等价于 os.path.isfile(path)，但每个目录只 os.scandir 一次
+    
+    合约文件通常集中在少数目录下，逐行 stat 变为集合查找；
+    名字不在列表中时（如大小写不敏感的文件系统）回退到 os.path.isfile。
+    """
+    directory, name = os.path.split(path)
+    names = dir_files.get(directory)
+    if names is None:
+        try:
+            with os.scandir(directory or ".") as entries:
+                names = {entry.name for entry in entries if entry.is_file()}
+        except OSError:
+            names = set()
+        dir_files[directory] = names
+    return name in names or os.path.isfile(path)
+
+
+def _file_sha256(path: str):
+    """文件内容的 SHA-256，读取失败时返回 None"""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _retarget_copied_reports(output_dir: str, old_source: str, new_source: str):
+    """
+    🔧 新增：复制来的报告中的源文件路径改为本合约的路径
+    
+    final_report.json 的 source_file、llm_vulnerability_report.jsonl 每行的 contract_file、
+    final_report.html 中的源文件都记录了首次分析的合约路径。
+    """
+    report_path = os.path.join(output_dir, "final_report.json")
+    if os.path.isfile(report_path):
+        report = json_io.read_json(report_path)
+        report["source_file"] = new_source
+        json_io.write_json(report_path, report)
+    
+    llm_report_path = os.path.join(output_dir, "llm_vulnerability_report.jsonl")
+    if os.path.isfile(llm_report_path):
+        with open(llm_report_path, "r", encoding="utf-8") as f:
+            entries = [json.loads(l) for l in f if l.strip()]
+        with open(llm_report_path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                entry["contract_file"] = new_source
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    
+    html_report_path = os.path.join(output_dir, "final_report.html")
+    if os.path.isfile(html_report_path):
+        with open(html_report_path, "r", encoding="utf-8") as f:
+            html = f.read()
+        html = html.replace(f"<code>{old_source}</code>", f"<code>{new_source}</code>", 1)
+        with open(html_report_path, "w", encoding="utf-8") as f:
+            f.write(html)
+
+
+def _run_one(task):
+    """
+    🔧 新增：在子进程中分析单个合约
+    
+    Args:
+        task: (序号, 文件名, Solidity版本, 关键变量, 源码路径, 输出目录)
+    
+    Returns:
+        (状态, 错误信息, 分析过程输出)，状态为 'success' / 'failed' / 'error'
+    """
+    _, _, solc_version, key_vars, solidity_path, output_dir = task
+    
+    # 分析过程的输出先收集起来，由主进程按合约整段打印，避免多个进程的输出交错
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        # 🔧 新增：按源码内容+版本查找编译缓存，命中时跳过 solc 编译
+        cache_key = solc_cache.cache_key(solidity_path, solc_version)
+        precompiled = solc_cache.load(cache_key)
+        
+        analyzer = AllInOneAnalyzer(
+            solc_version=solc_version,
+            key_variables=key_vars,
+            contract_path=solidity_path,
+            output_dir=output_dir,
+            precompiled_json=precompiled,
+        )
+        
+        try:
+            result = analyzer.run()
+            status, err = ("success" if result else "failed"), None
+        except Exception as e:
+            status, err = "error", str(e)
+        
+        if precompiled is None and analyzer.compiled_artifacts is not None:
+            solc_cache.store(cache_key, analyzer.compiled_artifacts)
+    
+    return status, err, log.getvalue()
+
+
 def main():
     print("🔄 开始批量重新分析所有合约...")
     print(f"📁 输出目录: {OUTPUT_ROOT}\n")
@@ -67,72 +198,105 @@ def main():
     failed = 0
     skipped = 0
     
+    # 🔧 改进：JSONL 只读取一次，计数与解析共用同一份行列表
     with open(JSONL_PATH, "r", encoding="utf-8") as f:
         lines = f.readlines()
-        total = len([l for l in lines if l.strip()])
+    total = sum(1 for l in lines if l.strip())
     
     print(f"📊 共 {total} 个合约待处理\n")
     print("="*80)
     
-    with open(JSONL_PATH, "r", encoding="utf-8") as f:
-        for idx, line in enumerate(f, 1):
-            line = line.strip()
-            if not line:
-                continue
-            
-            try:
-                item = json.loads(line)
-            except json.JSONDecodeError as e:
-                print(f"❌ [{idx}/{total}] JSON解析失败: {e}")
-                failed += 1
-                continue
-            
-            filename = item.get("filename")
-            solidity_path = item.get("filepath")
-            llm_raw = item.get("llm_response_raw")
-            
-            if not solidity_path or not os.path.isfile(solidity_path):
-                print(f"⏭️  [{idx}/{total}] 跳过 {filename} (文件不存在)")
-                skipped += 1
-                continue
-            
-            solc_version = extract_solc_version(solidity_path)
-            if not solc_version:
-                print(f"⏭️  [{idx}/{total}] 跳过 {filename} (无Solidity版本)")
-                skipped += 1
-                continue
-            
-            key_vars = extract_critical_vars_from_llm(llm_raw)
-            if not key_vars:
-                print(f"⏭️  [{idx}/{total}] 跳过 {filename} (无关键变量)")
-                skipped += 1
-                continue
+    # 🔧 改进：主进程先完成解析与筛选，只把纯数据的任务元组交给子进程
+    tasks = []
+    dir_files = {}  # 目录 → 其中的普通文件名集合（_is_file 使用）
+    for idx, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        
+        try:
+            item = json_io.loads(line)  # 🔧 改进：优先使用 orjson 解析
+        except json.JSONDecodeError as e:
+            print(f"❌ [{idx}/{total}] JSON解析失败: {e}")
+            failed += 1
+            continue
+        
+        filename = item.get("filename")
+        solidity_path = item.get("filepath")
+        llm_raw = item.get("llm_response_raw")
+        
+        if not solidity_path or not _is_file(solidity_path, dir_files):
+            print(f"⏭️  [{idx}/{total}] 跳过 {filename} (文件不存在)")
+            skipped += 1
+            continue
+        
+        solc_version = extract_solc_version(solidity_path)
+        if not solc_version:
+            print(f"⏭️  [{idx}/{total}] 跳过 {filename} (无Solidity版本)")
+            skipped += 1
+            continue
+        
+        key_vars = extract_critical_vars_from_llm(llm_raw)
+        if not key_vars:
+            print(f"⏭️  [{idx}/{total}] 跳过 {filename} (无关键变量)")
+            skipped += 1
+            continue
+        
+        # 输出目录（分析器创建自己的输出目录，复用结果的重复合约在复制时创建）
+        output_dir = os.path.join(OUTPUT_ROOT, os.path.splitext(filename)[0])
+        
+        tasks.append((idx, filename, solc_version, key_vars, solidity_path, output_dir))
+    
+    # 🔧 新增：源码内容、关键变量、版本都相同的合约（如克隆合约）只分析一次，
+    # 其余直接复制首次分析的输出目录
+    with ThreadPoolExecutor(max_workers=8) as hasher:
+        digests = list(hasher.map(_file_sha256, [task[4] for task in tasks]))
+    first_of = {}  # 签名 → 首次出现的任务
+    primary_of = []  # 每个任务对应的首次任务（自身即首次时为 None）
+    for task, digest in zip(tasks, digests):
+        sig = (digest, tuple(task[3]), task[2]) if digest is not None else task[0]
+        primary = first_of.setdefault(sig, task)
+        primary_of.append(primary if primary is not task else None)
+    unique_tasks = [task for task, primary in zip(tasks, primary_of) if primary is None]
+    
+    # 🔧 新增：各合约互不依赖，用进程池并行分析（solc编译与分析都是CPU密集）
+    # 每个任务耗时较长且差异大，chunksize=1 便于负载均衡；结果按任务顺序逐个输出
+    with ProcessPoolExecutor(max_workers=os.cpu_count(),
+                             mp_context=multiprocessing.get_context("spawn")) as executor:
+        outcomes = executor.map(_run_one, unique_tasks)
+        status_of = {}  # 首次任务的序号 → (状态, 错误信息)
+        for task, primary in zip(tasks, primary_of):
+            idx, filename, solc_version, key_vars, solidity_path, output_dir = task
             
-            # 输出目录
-            output_dir = os.path.join(OUTPUT_ROOT, os.path.splitext(filename)[0])
-            os.makedirs(output_dir, exist_ok=True)
+            if primary is None:
+                status, err, log = next(outcomes)
+                status_of[idx] = (status, err)
+            else:
+                status, err = status_of[primary[0]]
+                log = f"    ♻️  与 {primary[1]} 相同，复用其分析结果\n"
+                if status == "success" and primary[5] != output_dir:
+                    shutil.copytree(primary[5], output_dir, dirs_exist_ok=True)
+                    _retarget_copied_reports(output_dir, primary[4], solidity_path)
+                else:
+                    os.makedirs(output_dir, exist_ok=True)
             
-            print(f"\n▶️  [{idx}/{total}] 分析: {filename}")
-            print(f"    版本: {solc_version} | 变量: {', '.join(key_vars)}")
+            if status == "success":
+                status_line = f"    ✅ 成功"
+                success += 1
+            elif status == "failed":
+                status_line = f"    ❌ 失败"
+                failed += 1
+            else:
+                status_line = f"    💥 错误: {err}"
+                failed += 1
             
-            analyzer = AllInOneAnalyzer(
-                solc_version=solc_version,
-                key_variables=key_vars,
-                contract_path=solidity_path,
-                output_dir=output_dir,
+            # 🔧 改进：每个合约的输出拼成一段，一次写入并刷新（不再逐行 print）
+            sys.stdout.write(
+                f"\n▶️  [{idx}/{total}] 分析: {filename}\n"
+                f"    版本: {solc_version} | 变量: {', '.join(key_vars)}\n"
+                f"{log}{status_line}\n"
             )
-            
-            try:
-                result = analyzer.run()
-                if result:
-                    print(f"    ✅ 成功")
-                    success += 1
-                else:
-                    print(f"    ❌ 失败")
-                    failed += 1
-            except Exception as e:
-                print(f"    💥 错误: {e}")
-                failed += 1
+            sys.stdout.flush()
     
     print("\n" + "="*80)
     print("📊 重新分析完成!")
@@ -5,40 +5,50 @@
 """
 
 from core.analyzer import AllInOneAnalyzer
-import json
+from utils import json_io, solc_cache
+import contextlib
+import io
+import multiprocessing
 import os
+import sys
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
+# 🔧 改进：合约信息用不可变的命名元组（关键变量为元组），模块加载时构建一次
+Contract = namedtuple('Contract', 'name key_vars')
+
 # 根据汇总报告中最危险的5个合约
-TOP5_CONTRACTS = [
-    {
-        'name': '0xf4be3da9df0c12e69115bb5614334786fbaf5ace',
-        'key_vars': ['totalSupply', 'upgradeAgentStatus', 'maxTokenSupply', 'maxTokenSale', 
-                     'maxTokenForPreSale', 'minInvest', 'maxInvest']
-    },
-    {
-        'name': '0xf459034afc1fc2e0e8bddc8e3645c2b2935186f6',
-        'key_vars': ['activator', 'BET', 'ODD', 'EVEN', 'noBets', 'COMMISSION_PERCENTAGE', 
-                     'END_DURATION_BETTING_BLOCK', 'TARGET_DURATION_BETTING_BLOCK']
-    },
-    {
-        'name': '0xf46f049967ed63b864a7f6cdf91d6dac9ea23b2c',
-        'key_vars': ['WhaleAddr', 'amount']
-    },
-    {
-        'name': '0xf3d86b6974ddf5b8407cfdcd3f874a76f7538b90',
-        'key_vars': ['value', 'granter', 'cliff', 'vesting', 'start']
-    },
-    {
-        'name': '0xf4a3679eb0a3d9e8af9824a29bd32dd98d1e7127',
-        'key_vars': ['_initTime', '_expirationTime', '_realTokenPrice', '_controllerAddress', '_token']
-    }
-]
+TOP5_CONTRACTS = (
+    Contract(
+        name='0xf4be3da9df0c12e69115bb5614334786fbaf5ace',
+        key_vars=('totalSupply', 'upgradeAgentStatus', 'maxTokenSupply', 'maxTokenSale',
+                  'maxTokenForPreSale', 'minInvest', 'maxInvest'),
+    ),
+    Contract(
+        name='0xf459034afc1fc2e0e8bddc8e3645c2b2935186f6',
+        key_vars=('activator', 'BET', 'ODD', 'EVEN', 'noBets', 'COMMISSION_PERCENTAGE',
+                  'END_DURATION_BETTING_BLOCK', 'TARGET_DURATION_BETTING_BLOCK'),
+    ),
+    Contract(
+        name='0xf46f049967ed63b864a7f6cdf91d6dac9ea23b2c',
+        key_vars=('WhaleAddr', 'amount'),
+    ),
+    Contract(
+        name='0xf3d86b6974ddf5b8407cfdcd3f874a76f7538b90',
+        key_vars=('value', 'granter', 'cliff', 'vesting', 'start'),
+    ),
+    Contract(
+        name='0xf4a3679eb0a3d9e8af9824a29bd32dd98d1e7127',
+        key_vars=('_initTime', '_expirationTime', '_realTokenPrice', '_controllerAddress',
+                  '_token'),
+    ),
+)
 
 def analyze_contract(contract_info, base_output_dir):
     """分析单个合约"""
-    contract_name = contract_info['name']
-    key_vars = contract_info['key_vars']
+    contract_name = contract_info.name
+    key_vars = contract_info.key_vars
     
     solidity_path = f"/Users/almightyfish/Desktop/AChecker/AC/undependency/{contract_name}.sol"
     output_dir = os.path.join(base_output_dir, contract_name)
@@ -52,15 +62,23 @@ def analyze_contract(contract_info, base_output_dir):
     print(f"{'='*80}")
     print(f"关键变量: {', '.join(key_vars[:3])}{'...' if len(key_vars) > 3 else ''}")
     
+    solc_version = '0.4.18'  # 大多数合约使用此版本
+    # 🔧 新增：按源码内容+版本查找编译缓存，命中时跳过 solc 编译
+    cache_key = solc_cache.cache_key(solidity_path, solc_version)
+    precompiled = solc_cache.load(cache_key)
+    
     analyzer = AllInOneAnalyzer(
-        solc_version='0.4.18',  # 大多数合约使用此版本
+        solc_version=solc_version,
         key_variables=key_vars,
         contract_path=solidity_path,
         output_dir=output_dir,
+        precompiled_json=precompiled,
     )
     
     try:
         result = analyzer.run()
+        if precompiled is None and analyzer.compiled_artifacts is not None:
+            solc_cache.store(cache_key, analyzer.compiled_artifacts)
         if result:
             print(f"✅ 分析完成: {contract_name}")
             return {
@@ -84,49 +102,55 @@ def analyze_contract(contract_info, base_output_dir):
             'error': str(e)
         }
 
+def _run_one(task):
+    """🔧 新增：在子进程中分析单个合约，返回 (分析结果, 分析过程输出)"""
+    contract_info, base_output_dir = task
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        result = analyze_contract(contract_info, base_output_dir)
+    return result, log.getvalue()
+
 def summarize_results(results):
     """汇总分析结果"""
-    print("\n" + "="*80)
-    print("📊 汇总结果对比")
-    print("="*80)
+    # 🔧 改进：汇总输出先收集到列表，最后一次写入stdout（不再逐行 print）
+    out = ["\n" + "="*80, "📊 汇总结果对比", "="*80]
     
     total_dangerous = 0
     total_suspicious = 0
     
-    for result in results:
-        if result and result['status'] == 'success':
-            contract_name = result['contract']
-            report_path = result['report_path']
-            
-            with open(report_path, 'r', encoding='utf-8') as f:
-                report_data = json.load(f)
-            
-            dangerous_count = 0
-            suspicious_count = 0
-            
-            for var_result in report_data['results']:
-                dangerous_count += len(var_result.get('dangerous_locations', []))
-                suspicious_count += len(var_result.get('suspicious_locations', []))
-            
-            total_dangerous += dangerous_count
-            total_suspicious += suspicious_count
-            
-            print(f"\n{contract_name}:")
-            print(f"  危险路径: {dangerous_count}")
-            print(f"  可疑路径: {suspicious_count}  {'✅ 有改进！' if suspicious_count > 0 else '⚠️  仍然是0'}")
+    # 🔧 改进：报告读取互不依赖，先用线程池并行加载所有成功合约的报告（保持原顺序）
+    succeeded = [result for result in results if result and result['status'] == 'success']
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        reports = list(executor.map(json_io.read_json, [r['report_path'] for r in succeeded]))
     
-    print("\n" + "-"*80)
-    print(f"合计:")
-    print(f"  危险路径总数: {total_dangerous}")
-    print(f"  可疑路径总数: {total_suspicious}  {'✅ 不再全是0！' if total_suspicious > 0 else '❌ 修复未生效'}")
+    for result, report_data in zip(succeeded, reports):
+        contract_name = result['contract']
+        var_results = report_data['results']
+        
+        dangerous_count = sum(len(v.get('dangerous_locations', ())) for v in var_results)
+        suspicious_count = sum(len(v.get('suspicious_locations', ())) for v in var_results)
+        
+        total_dangerous += dangerous_count
+        total_suspicious += suspicious_count
+        
+        out.append(f"\n{contract_name}:")
+        out.append(f"  危险路径: {dangerous_count}")
+        out.append(f"  可疑路径: {suspicious_count}  {'✅ 有改进！' if suspicious_count > 0 else '⚠️  仍然是0'}")
+        
+    out.append("\n" + "-"*80)
+    out.append(f"合计:")
+    out.append(f"  危险路径总数: {total_dangerous}")
+    out.append(f"  可疑路径总数: {total_suspicious}  {'✅ 不再全是0！' if total_suspicious > 0 else '❌ 修复未生效'}")
     
     if total_suspicious > 0:
-        print("\n✅ 修复成功！require语句被正确识别为可疑路径！")
-        print(f"   改进率: 可疑路径从0增加到{total_suspicious}")
+        out.append("\n✅ 修复成功！require语句被正确识别为可疑路径！")
+        out.append(f"   改进率: 可疑路径从0增加到{total_suspicious}")
     else:
-        print("\n⚠️  警告：可疑路径仍然是0，修复可能未完全生效")
+        out.append("\n⚠️  警告：可疑路径仍然是0，修复可能未完全生效")
     
-    print("="*80)
+    out.append("="*80)
+    sys.stdout.write("\n".join(out) + "\n")
+    sys.stdout.flush()
 
 def main():
     print("🚀 重新分析Top5最危险合约 - 验证require识别修复")
@@ -136,10 +160,14 @@ def main():
     
     base_output_dir = "/Users/almightyfish/Desktop/AChecker/analysis_output"
     
+    # 🔧 改进：5个合约互不依赖，用进程池并行分析；各合约的输出按原顺序整段打印
     results = []
-    for contract_info in TOP5_CONTRACTS:
-        result = analyze_contract(contract_info, base_output_dir)
-        results.append(result)
+    with ProcessPoolExecutor(max_workers=os.cpu_count(),
+                             mp_context=multiprocessing.get_context("spawn")) as executor:
+        tasks = [(contract_info, base_output_dir) for contract_info in TOP5_CONTRACTS]
+        for result, log in executor.map(_run_one, tasks):
+            print(log, end="")
+            results.append(result)
     
     summarize_results(results)
 
@@ -6,6 +6,7 @@
 
 import sys
 import os
+import tempfile
 
 # 添加core目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -57,14 +58,19 @@ contract TestContract {
 }
 """
     
-    # 保存测试合约
-    test_file = "/tmp/test_access_control.sol"
-    with open(test_file, 'w', encoding='utf-8') as f:
-        f.write(test_contract)
-    
-    # 创建SourceMapper实例
-    mapper = SourceMapper(test_file, "/tmp/test_output")
-    
+    # 保存测试合约（临时目录，测试结束后连同输出目录一起删除）
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        test_file = os.path.join(tmp_dir, "test_access_control.sol")
+        with open(test_file, 'w', encoding='utf-8') as f:
+            f.write(test_contract)
+        
+        # 创建SourceMapper实例（解析一次，以下各项检查共用）
+        mapper = SourceMapper(test_file, os.path.join(tmp_dir, "output"))
+        _check_mapper(mapper)
+
+
+def _check_mapper(mapper):
+    """对同一个 SourceMapper 依次执行各项检查"""
     print("=" * 80)
     print("测试访问控制修饰符检测功能")
     print("=" * 80)
@@ -75,6 +81,7 @@ contract TestContract {
     print(f"  结果: {has_modifier}")
     print(f"  期望: True")
     print(f"  {'✅ 通过' if has_modifier else '❌ 失败'}")
+    assert has_modifier
     
     # 测试2: 检测onlyAdmin修饰符
     print("\n[测试2] 检测 setBalanceWithAdmin 函数的访问控制修饰符:")
@@ -82,6 +89,7 @@ contract TestContract {
     print(f"  结果: {has_modifier}")
     print(f"  期望: True")
     print(f"  {'✅ 通过' if has_modifier else '❌ 失败'}")
+    assert has_modifier
     
     # 测试3: 无修饰符的函数
     print("\n[测试3] 检测 setBalanceWithoutModifier 函数的访问控制修饰符:")
@@ -89,6 +97,7 @@ contract TestContract {
     print(f"  结果: {has_modifier}")
     print(f"  期望: False")
     print(f"  {'✅ 通过' if not has_modifier else '❌ 失败'}")
+    assert not has_modifier
     
     # 测试4: 有require但无修饰符的函数
     print("\n[测试4] 检测 setBalanceWithRequire 函数的访问控制修饰符:")
@@ -96,6 +105,7 @@ contract TestContract {
     print(f"  结果: {has_modifier}")
     print(f"  期望: False (require不算修饰符)")
     print(f"  {'✅ 通过' if not has_modifier else '❌ 失败'}")
+    assert not has_modifier
     
     # 测试5: 检查函数映射
     print("\n[测试5] 函数映射:")
@@ -105,10 +115,6 @@ contract TestContract {
     print("\n" + "=" * 80)
     print("测试完成！")
     print("=" * 80)
-    
-    # 清理
-    if os.path.exists(test_file):
-        os.remove(test_file)
 
 
 if __name__ == "__main__":
@@ -6,7 +6,7 @@
 """
 
 from core.analyzer import AllInOneAnalyzer
-import json
+from utils import json_io
 
 def main():
     print("🧪 测试Fallback函数识别 - BBTDonate合约")
@@ -48,8 +48,7 @@ def main():
     
     # 读取生成的报告
     report_path = f"{output_dir}/final_report.json"
-    with open(report_path, 'r', encoding='utf-8') as f:
-        report_data = json.load(f)
+    report_data = json_io.read_json(report_path)
     
     # 验证：检查 totalReceive 变量
     print(f"\n【验证】totalReceive 变量")
@@ -9,28 +9,60 @@
 - 变量被用于敏感函数调用（selfdestruct）
 """
 
+import atexit
+import contextlib
+import io
+import json
+import multiprocessing
 import os
 import sys
 import tempfile
 import shutil
+import traceback
+from concurrent.futures import ProcessPoolExecutor
 
 # 添加路径
 sys.path.insert(0, os.path.dirname(__file__))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from core.analyzer import AllInOneAnalyzer
+from utils import solc_cache
+from utils.colors import Colors
 
+# 临时文件目录：Linux 上优先使用内存文件系统 /dev/shm（tmpfs），其他系统用默认临时目录
+# 分析过程会调用 solc 读取合约文件，需要真实路径，因此不使用内存模拟文件系统
+TEMP_ROOT = '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else None
 
-def create_vulnerable_contract():
-    """
-    创建一个有漏洞的测试合约
-    
-    漏洞场景：
-    1. owner 变量可以被任意用户修改（污点传播）
-    2. destroy 函数使用 selfdestruct（敏感函数）
-    3. 污点数据可以到达敏感函数
-    """
-    contract_code = """
+# 测试合约使用的 solc 版本
+SOLC_VERSION = '0.4.24'
+
+# 🔧 改进：编译缓存默认使用本次运行独立的临时目录（退出时删除），不读写用户的全局缓存 ~/.cache/achecker/solc；
+# 运行前设置 ACHECKER_SOLC_CACHE_DIR 可改用指定的缓存目录。
+# 通过环境变量传递，spawn 启动的用例子进程重新导入本模块时沿用同一目录
+if not os.environ.get(solc_cache.CACHE_DIR_ENV):
+    os.environ[solc_cache.CACHE_DIR_ENV] = tempfile.mkdtemp(prefix='achecker-solc-cache-', dir=TEMP_ROOT)
+    atexit.register(shutil.rmtree, os.environ[solc_cache.CACHE_DIR_ENV], ignore_errors=True)
+
+# 🔧 改进：支持 fork 的平台（POSIX）上用 fork 启动用例子进程，直接继承已导入的分析器模块（写时复制），
+# 不必在每个子进程中重新导入；其他平台（Windows）回退到 spawn
+_MP_START_METHOD = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+
+# 终端中是否逐条打印检测到的流（python test_taint_to_sensitive.py --verbose）；默认只打印汇总行
+# （标准输出不是终端时总是输出一行紧凑JSON）
+VERBOSE = '--verbose' in sys.argv[1:]
+
+# 标准输出是否为终端（在导入时判断：子进程运行用例时标准输出已被重定向到缓冲区）
+_STDOUT_IS_TTY = sys.stdout.isatty()
+
+# 🔧 改进：颜色码在导入时取出为模块级常量；标准输出不是终端（如CI中重定向到日志文件）时不输出ANSI颜色码
+if _STDOUT_IS_TTY:
+    RED, GREEN, YELLOW, ENDC = Colors.RED, Colors.GREEN, Colors.YELLOW, Colors.ENDC
+else:
+    RED = GREEN = YELLOW = ENDC = ""
+
+
+# 🔧 改进：测试合约源码作为模块级常量（连同UTF-8编码后的字节）只构建一次
+_VULNERABLE_SRC = """
 pragma solidity ^0.4.24;
 
 contract VulnerableContract {
@@ -61,19 +93,9 @@ contract VulnerableContract {
     }
 }
 """
-    return contract_code
+_VULNERABLE_SRC_BYTES = _VULNERABLE_SRC.encode('utf-8')
 
-
-def create_safe_contract():
-    """
-    创建一个安全的测试合约
-    
-    安全措施：
-    1. owner 变量有 onlyOwner 保护
-    2. destroy 函数有 onlyOwner 保护
-    3. 污点无法到达敏感函数
-    """
-    contract_code = """
+_SAFE_SRC = """
 pragma solidity ^0.4.24;
 
 contract SafeContract {
@@ -105,96 +127,164 @@ contract SafeContract {
     }
 }
 """
-    return contract_code
+_SAFE_SRC_BYTES = _SAFE_SRC.encode('utf-8')
 
 
-def test_vulnerable_contract():
-    """测试有漏洞的合约"""
-    print("\n" + "=" * 80)
-    print("🔴 测试 1: 有漏洞的合约（污点 → 敏感函数）")
-    print("=" * 80)
+def _write_contract(path, data_bytes):
+    """用一次 os.write 写入合约文件（内容很小，不经过缓冲的文件对象）"""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data_bytes)
+    finally:
+        os.close(fd)
+
+
+def _run_analyzer(contract_path, output_dir):
+    """
+    🔧 新增：运行分析（编译产物按源码缓存到磁盘，缓存目录见 ACHECKER_SOLC_CACHE_DIR）
     
-    # 创建临时目录
-    temp_dir = tempfile.mkdtemp()
-    contract_path = os.path.join(temp_dir, "VulnerableContract.sol")
-    output_dir = os.path.join(temp_dir, "output_vulnerable")
+    同一合约文件再次分析时直接使用缓存的编译产物，跳过 solc 编译。
+    """
+    solc_version = SOLC_VERSION
+    cache_key = solc_cache.cache_key(contract_path, solc_version)
+    precompiled = solc_cache.load(cache_key)
     
-    try:
-        # 保存合约
-        with open(contract_path, 'w', encoding='utf-8') as f:
-            f.write(create_vulnerable_contract())
-        
-        # 运行分析
-        analyzer = AllInOneAnalyzer(
-            solc_version='0.4.24',
-            key_variables=['owner'],
-            contract_path=contract_path,
-            output_dir=output_dir
-        )
-        
-        result = analyzer.run()
-        
-        if result:
-            print("\n" + "=" * 80)
-            print("📊 分析结果")
-            print("=" * 80)
-            
-            # 检查是否检测到污点到敏感函数的流
-            flows = result.get('taint_to_sensitive_flows', [])
-            
-            if flows:
-                print(f"\n{Colors.RED}✅ 成功检测到污点传播到敏感函数！{Colors.ENDC}")
-                print(f"   发现 {len(flows)} 条危险路径")
-                
-                for i, flow in enumerate(flows, 1):
-                    print(f"\n   路径 {i}:")
-                    print(f"     变量: {flow['variable']}")
-                    print(f"     路径长度: {flow['path_length']} 个基本块")
-                    print(f"     敏感操作数: {flow['sensitive_count']}")
-                    print(f"     风险级别: {flow['risk_level']}")
-                    
-                    for sb in flow.get('sensitive_blocks', []):
-                        for op in sb.get('operations', []):
-                            print(f"       → {op['opcode']}: {op['description']}")
-            else:
-                print(f"\n{Colors.YELLOW}⚠️  未检测到污点到敏感函数的流{Colors.ENDC}")
-                print("   这可能表示检测逻辑需要调整")
+    analyzer = AllInOneAnalyzer(
+        solc_version=solc_version,
+        key_variables=['owner'],
+        contract_path=contract_path,
+        output_dir=output_dir,
+        precompiled_json=precompiled,
+    )
+    
+    result = analyzer.run()
+    if precompiled is None and analyzer.compiled_artifacts is not None:
+        solc_cache.store(cache_key, analyzer.compiled_artifacts)
+    return result
+
+
+def create_vulnerable_contract():
+    """
+    创建一个有漏洞的测试合约
+    
+    漏洞场景：
+    1. owner 变量可以被任意用户修改（污点传播）
+    2. destroy 函数使用 selfdestruct（敏感函数）
+    3. 污点数据可以到达敏感函数
+    """
+    return _VULNERABLE_SRC
+
+
+def create_safe_contract():
+    """
+    创建一个安全的测试合约
+    
+    安全措施：
+    1. owner 变量有 onlyOwner 保护
+    2. destroy 函数有 onlyOwner 保护
+    3. 污点无法到达敏感函数
+    """
+    return _SAFE_SRC
+
+
+# 🔧 改进：两个测试只有合约源码、预期结果和提示信息不同，用同一个 _run_case 按表驱动执行
+# expect_flows: 是否预期检测到污点到敏感函数的流
+# {n}: 检测到的流数量
+CASES = [
+    {
+        "name": "vulnerable",
+        "title": "🔴 测试 1: 有漏洞的合约（污点 → 敏感函数）",
+        "contract_file": "VulnerableContract.sol",
+        "output_subdir": "output_vulnerable",
+        "src_bytes": _VULNERABLE_SRC_BYTES,
+        "expect_flows": True,
+        "pass_color": RED,
+        "pass_msg": "✅ 成功检测到污点传播到敏感函数！",
+        "pass_note": "   发现 {n} 条危险路径",
+        "fail_msg": "⚠️  未检测到污点到敏感函数的流",
+        "fail_note": "   这可能表示检测逻辑需要调整",
+    },
+    {
+        "name": "safe",
+        "title": "🟢 测试 2: 安全的合约（有访问控制保护）",
+        "contract_file": "SafeContract.sol",
+        "output_subdir": "output_safe",
+        "src_bytes": _SAFE_SRC_BYTES,
+        "expect_flows": False,
+        "pass_color": GREEN,
+        "pass_msg": "✅ 正确：未检测到污点传播到敏感函数",
+        "pass_note": "   访问控制有效阻止了污点传播",
+        "fail_msg": "⚠️  检测到 {n} 条流",
+        "fail_note": "   这可能是误报，需要人工审查",
+    },
+]
+
+
+def _print_flows(flows):
+    """
+    打印污点到敏感函数的流
+    
+    🔧 改进：标准输出是终端时逐条打印便于阅读；否则（CI日志）整体输出一行紧凑JSON
+    """
+    if not _STDOUT_IS_TTY:
+        print(json.dumps({"flow_count": len(flows), "flows": flows},
+                         ensure_ascii=False, separators=(",", ":")))
+        return
+    
+    for i, flow in enumerate(flows, 1):
+        # 🔧 改进：每条流的字段只取一次，绑定到局部变量
+        variable, path_length = flow['variable'], flow['path_length']
+        sensitive_count, risk_level = flow['sensitive_count'], flow['risk_level']
+        print(f"\n   路径 {i}:")
+        print(f"     变量: {variable}")
+        print(f"     路径长度: {path_length} 个基本块")
+        print(f"     敏感操作数: {sensitive_count}")
+        print(f"     风险级别: {risk_level}")
         
-    except Exception as e:
-        print(f"\n❌ 测试失败: {e}")
-        import traceback
-        traceback.print_exc()
-    finally:
-        # 清理
-        if os.path.exists(temp_dir):
-            shutil.rmtree(temp_dir)
+        for sb in flow.get('sensitive_blocks') or ():
+            for op in sb.get('operations') or ():
+                opcode, description = op['opcode'], op['description']
+                print(f"       → {opcode}: {description}")
 
 
-def test_safe_contract():
-    """测试安全的合约"""
+def _summarize(flows):
+    """🔧 新增：一次遍历汇总流的数量、路径长度和严重风险数"""
+    total = len(flows)
+    path_total = 0
+    max_path = 0
+    critical = 0
+    for flow in flows:
+        length = flow['path_length']
+        path_total += length
+        if length > max_path:
+            max_path = length
+        if flow['risk_level'] == 'critical':
+            critical += 1
+    return {
+        "total": total,
+        "avg_path": path_total / total if total else 0.0,
+        "max_path": max_path,
+        "critical": critical,
+    }
+
+
+def _run_case(case):
+    """运行一个测试用例：写入合约、分析，并检查是否检测到污点到敏感函数的流"""
     print("\n" + "=" * 80)
-    print("🟢 测试 2: 安全的合约（有访问控制保护）")
+    print(case["title"])
     print("=" * 80)
     
     # 创建临时目录
-    temp_dir = tempfile.mkdtemp()
-    contract_path = os.path.join(temp_dir, "SafeContract.sol")
-    output_dir = os.path.join(temp_dir, "output_safe")
+    temp_dir = tempfile.mkdtemp(dir=TEMP_ROOT)
+    contract_path = os.path.join(temp_dir, case["contract_file"])
+    output_dir = os.path.join(temp_dir, case["output_subdir"])
     
     try:
         # 保存合约
-        with open(contract_path, 'w', encoding='utf-8') as f:
-            f.write(create_safe_contract())
+        _write_contract(contract_path, case["src_bytes"])
         
         # 运行分析
-        analyzer = AllInOneAnalyzer(
-            solc_version='0.4.24',
-            key_variables=['owner'],
-            contract_path=contract_path,
-            output_dir=output_dir
-        )
-        
-        result = analyzer.run()
+        result = _run_analyzer(contract_path, output_dir)
         
         if result:
             print("\n" + "=" * 80)
@@ -203,30 +293,48 @@ def test_safe_contract():
             
             # 检查是否检测到污点到敏感函数的流
             flows = result.get('taint_to_sensitive_flows', [])
+            n = len(flows)
             
-            if not flows:
-                print(f"\n{Colors.GREEN}✅ 正确：未检测到污点传播到敏感函数{Colors.ENDC}")
-                print("   访问控制有效阻止了污点传播")
+            if bool(flows) == case["expect_flows"]:
+                print(f"\n{case['pass_color']}{case['pass_msg'].format(n=n)}{ENDC}")
+                print(case["pass_note"].format(n=n))
             else:
-                print(f"\n{Colors.YELLOW}⚠️  检测到 {len(flows)} 条流{Colors.ENDC}")
-                print("   这可能是误报，需要人工审查")
+                print(f"\n{YELLOW}{case['fail_msg'].format(n=n)}{ENDC}")
+                print(case["fail_note"].format(n=n))
+            
+            # 🔧 改进：先打印汇总行；非终端（CI）总是再输出一行紧凑JSON，终端中逐条的流只在 --verbose 时打印
+            summary = _summarize(flows)
+            print(f"   汇总: {summary['total']} 条流, 平均路径长度 {summary['avg_path']:.1f}, "
+                  f"最长 {summary['max_path']} 个基本块, 严重风险 {summary['critical']} 条")
+            if flows and (VERBOSE or not _STDOUT_IS_TTY):
+                _print_flows(flows)
         
     except Exception as e:
         print(f"\n❌ 测试失败: {e}")
-        import traceback
-        traceback.print_exc()
+        # 只输出最外层的20个栈帧，避免打印分析器内部很深的调用栈
+        traceback.print_exc(limit=20, file=sys.stderr)
     finally:
         # 清理
         if os.path.exists(temp_dir):
             shutil.rmtree(temp_dir)
 
 
-# 导入 Colors（如果可用）
-try:
-    from utils.colors import Colors
-except:
-    class Colors:
-        RED = GREEN = YELLOW = ENDC = ""
+def test_vulnerable_contract():
+    """测试有漏洞的合约"""
+    _run_case(CASES[0])
+
+
+def test_safe_contract():
+    """测试安全的合约"""
+    _run_case(CASES[1])
+
+
+def _run_captured(case):
+    """在子进程中运行一个测试用例，返回其 (stdout, stderr) 输出"""
+    out, err = io.StringIO(), io.StringIO()
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        _run_case(case)
+    return out.getvalue(), err.getvalue()
 
 
 if __name__ == "__main__":
@@ -234,11 +342,14 @@ if __name__ == "__main__":
     print("🧪 污点传播到敏感函数的关联检测测试")
     print("=" * 80)
     
-    # 测试1: 有漏洞的合约
-    test_vulnerable_contract()
-    
-    # 测试2: 安全的合约
-    test_safe_contract()
+    # 🔧 改进：各测试用例互不依赖，在多个进程中并行运行（测试1: 有漏洞的合约；测试2: 安全的合约）
+    # 各自的输出先收集起来，按用例顺序整段打印
+    with ProcessPoolExecutor(max_workers=len(CASES),
+                             mp_context=multiprocessing.get_context(_MP_START_METHOD)) as executor:
+        for out, err in executor.map(_run_captured, CASES):
+            sys.stdout.write(out)
+            sys.stdout.flush()
+            sys.stderr.write(err)
     
     print("\n" + "=" * 80)
     print("✅ 测试完成")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSON输出工具
+
+安装了 orjson 时使用其C实现序列化（直接生成UTF-8字节），
+否则回退到标准库 json，输出内容等价。
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:  # orjson 为可选依赖
+    orjson = None
+
+# 写文件时的缓冲区大小（批量写入，减少系统调用）
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+def _dumps_bytes(obj, indent: bool) -> bytes:
+    """序列化为UTF-8字节；orjson无法处理的数据（如超过64位的整数）回退到标准库"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, option=option)
+        except TypeError:  # orjson.JSONEncodeError 是 TypeError 的子类
+            pass
+    return json.dumps(obj, indent=2 if indent else None, ensure_ascii=False).encode('utf-8')
+
+
+def loads(data):
+    """解析JSON文本（str或bytes）；orjson无法解析的内容（如NaN、超过64位的整数）回退到标准库
+
+    确实无效的JSON由标准库抛出 json.JSONDecodeError（错误信息与 json.loads 相同）。
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def read_json(path: str):
+    """读取JSON文件（解析规则同 loads）"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def write_json(path: str, obj):
+    """写入缩进格式的JSON文件（等价于 json.dump(obj, f, indent=2, ensure_ascii=False)）"""
+    with open(path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(_dumps_bytes(obj, indent=True))
+
+
+class JsonlWriter:
+    """增量写入JSONL文件（每行一个紧凑JSON对象），用作上下文管理器"""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'wb', buffering=WRITE_BUFFER_SIZE)
+
+    def write(self, record):
+        self._file.write(_dumps_bytes(record, indent=False) + b'\n')
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def write_jsonl(path: str, records):
+    """写入JSONL文件（每行一个紧凑JSON对象），所有记录拼接后一次写入"""
+    payload = b''.join(_dumps_bytes(record, indent=False) + b'\n' for record in records)
+    with open(path, 'wb') as f:
+        f.write(payload)
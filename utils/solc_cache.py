@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+solc编译产物的磁盘缓存
+
+以（源码路径 + 源码及其递归 import 的文件内容 + solc版本）的哈希为键保存
+ContractCompiler 的编译产物，重新分析同一合约时跳过 solc 编译。
+"""
+
+import hashlib
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from . import json_io
+
+# 缓存目录
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "achecker", "solc")
+
+# 设置该环境变量时改用其指定的缓存目录（如测试使用独立的临时目录）
+CACHE_DIR_ENV = "ACHECKER_SOLC_CACHE_DIR"
+
+
+# import 语句中的文件路径（import "a.sol"; import "a.sol" as A; import * as A from "a.sol"; import {X} from "a.sol";）
+_IMPORT_RE = re.compile(rb"""\bimport\s+(?:[^;'"]*?\bfrom\s+)?["']([^"']+)["']""")
+
+
+def _resolve_import(importing_file: str, target: str) -> str:
+    """import 路径对应的文件：./ ../ 开头的相对于所在文件目录，其余相对于当前工作目录（同 solc 命令行）"""
+    if target.startswith(('./', '../')):
+        return os.path.normpath(os.path.join(os.path.dirname(importing_file), target))
+    return os.path.abspath(target)
+
+
+def _source_closure(contract_path: str) -> List[Tuple[str, Optional[bytes]]]:
+    """
+    合约文件及其递归 import 的所有文件：[(绝对路径, 内容)]
+    
+    无法读取的 import（如需要重映射的包路径）内容为 None，只以路径参与缓存键。
+    合约文件本身无法读取时抛出 OSError。
+    """
+    root = os.path.abspath(contract_path)
+    with open(root, 'rb') as f:
+        sources = [(root, f.read())]
+    seen = {root}
+    i = 0
+    while i < len(sources):
+        path, data = sources[i]
+        i += 1
+        if data is None or b'import' not in data:
+            continue
+        for match in _IMPORT_RE.finditer(data):
+            target = _resolve_import(path, match.group(1).decode('utf-8', 'surrogateescape'))
+            if target in seen:
+                continue
+            seen.add(target)
+            try:
+                with open(target, 'rb') as f:
+                    sources.append((target, f.read()))
+            except OSError:
+                sources.append((target, None))
+    return sources
+
+
+def cache_key(contract_path: str, solc_version: str) -> str:
+    """
+    源码路径、源码及其递归 import 的文件内容、solc版本共同决定的缓存键
+    
+    编译产物（combined.json、srcmap）中记录了源文件路径，import 的文件改变也会改变编译结果，
+    因此都计入缓存键。
+    """
+    h = hashlib.blake2b()
+    h.update(solc_version.encode())
+    for path, data in _source_closure(contract_path):
+        h.update(b'\0' + path.encode('utf-8', 'surrogateescape') + b'\0')
+        if data is None:
+            h.update(b'-')
+        else:
+            h.update(b'%d:' % len(data))
+            h.update(data)
+    return h.hexdigest()
+
+
+def _cache_dir() -> str:
+    """当前使用的缓存目录（环境变量优先，其次 CACHE_DIR）"""
+    return os.environ.get(CACHE_DIR_ENV) or CACHE_DIR
+
+
+def contains(key: str) -> bool:
+    """缓存中是否已有该键的编译产物"""
+    return os.path.isfile(os.path.join(_cache_dir(), f"{key}.json"))
+
+
+def load(key: str) -> Optional[Dict]:
+    """读取缓存的编译产物，不存在或无法解析时返回 None"""
+    path = os.path.join(_cache_dir(), f"{key}.json")
+    if not os.path.isfile(path):
+        return None
+    try:
+        return json_io.read_json(path)
+    except (OSError, ValueError):
+        return None
+
+
+def store(key: str, artifacts: Dict):
+    """保存编译产物（先写临时文件再改名，多个进程同时写入同一键也不会读到半个文件）"""
+    cache_dir = _cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{key}.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    json_io.write_json(tmp_path, artifacts)
+    os.replace(tmp_path, path)